@@ -1,19 +1,43 @@
 """
 FastAPI Backend Application
 """
+import asyncio
 import os
 import re
 import time
 import bcrypt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from jose import JWTError, jwt
 from dotenv import load_dotenv
-from app.models import DatabaseService, supabase, get_db_connection
+from app.models import DatabaseService, supabase, get_db_connection, LEADERBOARD_MAX_LIMIT
+from app.utils import decode_cursor, next_cursor
+from app.db_pool import get_pool
+from app.db_async import get_async_pool, close_async_pool, async_pool_stats
+from app import db_metrics
+from app.leaderboard_index import (
+    leaderboard_index,
+    LEADERBOARD_INDEX_ENABLED,
+    LEADERBOARD_INDEX_REFRESH_SECONDS,
+)
+from app.task_catalog import task_catalog
+from app.cache import user_cache, admin_cache
+from app.db_listener import start_listener, stop_listener
+from app.http_cache import cached_json, bump_resource
+from app import telegram_api
+from app.membership_cache import membership_cache
+from app.user_registry import user_registry
+from app.leaderboard_periods import (
+    PERIODS,
+    POINTS_ROLLUP_INTERVAL_SECONDS,
+    POINTS_ROLLUP_LAG_SECONDS,
+    period_bounds,
+    period_leaderboard_cache,
+)
 from postgrest.exceptions import APIError
 from psycopg2 import OperationalError
 from psycopg2.errors import UndefinedColumn
@@ -35,8 +59,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"] + (
+        ["X-DB-Queries", "X-DB-Time-Ms"] if db_metrics.DB_METRICS_HEADERS else []
+    ),
 )
 
+
+def route_template(request: Request) -> str:
+    """Route path with placeholders (/api/users/{telegram_id}) so metrics group by endpoint
+
+    The router stores the matched route in the request scope; before routing
+    (or with no match) the request is reported as <unmatched>.
+    """
+    route = request.scope.get("route")
+    return f"{request.method} {getattr(route, 'path', '<unmatched>')}"
+
+
+@app.middleware("http")
+async def track_database_queries(request: Request, call_next):
+    """Attribute queries to the route serving them and enforce the per-request budget"""
+    token = db_metrics.start_request(lambda: route_template(request))
+    try:
+        response = await call_next(request)
+    finally:
+        queries = db_metrics.end_request(token)
+    # Per-request DB cost is internal; only sent when debugging (see /api/admin/db-metrics)
+    if db_metrics.DB_METRICS_HEADERS:
+        response.headers["X-DB-Queries"] = str(queries.count)
+        response.headers["X-DB-Time-Ms"] = f"{queries.total_ms:.1f}"
+    return response
+
 # Security
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -44,6 +96,101 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 
 security = HTTPBearer()
 
+
+@app.on_event("startup")
+async def warm_database_pool():
+    """Open the minimum number of pooled connections before serving traffic"""
+    try:
+        get_pool().warm()
+        await get_async_pool()
+    except Exception as exc:
+        print(f"⚠️  Could not warm database pool: {exc}")
+
+
+async def refresh_leaderboard_index():
+    """Rebuild the in-memory leaderboard index periodically (catches writes from other processes)"""
+    while True:
+        await asyncio.sleep(LEADERBOARD_INDEX_REFRESH_SECONDS)
+        try:
+            await asyncio.to_thread(leaderboard_index.warm)
+        except Exception as exc:
+            print(f"⚠️  Could not build leaderboard index: {exc}")
+
+
+@app.on_event("startup")
+async def start_leaderboard_index():
+    """Warm the leaderboard index before serving traffic, then keep refreshing it"""
+    if not LEADERBOARD_INDEX_ENABLED:
+        return
+    try:
+        await asyncio.to_thread(leaderboard_index.warm)
+    except Exception as exc:
+        print(f"⚠️  Could not build leaderboard index: {exc}")
+    if LEADERBOARD_INDEX_REFRESH_SECONDS > 0:
+        app.state.leaderboard_refresh = asyncio.create_task(refresh_leaderboard_index())
+
+
+COUNTER_RECONCILE_INTERVAL_SECONDS = float(os.getenv("COUNTER_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+
+async def reconcile_counters():
+    """Periodically repair drift in the trigger-maintained completion and system counters"""
+    while True:
+        await asyncio.sleep(COUNTER_RECONCILE_INTERVAL_SECONDS)
+        try:
+            fixed = await DatabaseService.reconcile_completion_counters_async()
+            if fixed["users_fixed"] or fixed["tasks_fixed"]:
+                print(f"⚠️  Repaired completion counters: {fixed['users_fixed']} users, {fixed['tasks_fixed']} tasks")
+            fixed = await DatabaseService.reconcile_system_counters_async()
+            if fixed["counters_fixed"]:
+                print(f"⚠️  Repaired {fixed['counters_fixed']} system counters")
+        except Exception as exc:
+            print(f"⚠️  Could not reconcile counters: {exc}")
+
+
+@app.on_event("startup")
+async def start_counter_reconciler():
+    if COUNTER_RECONCILE_INTERVAL_SECONDS > 0:
+        app.state.counter_reconciler = asyncio.create_task(reconcile_counters())
+
+
+async def refresh_points_rollup():
+    """Fold new ledger rows into user_points_daily (period leaderboards)"""
+    while True:
+        try:
+            refreshed = await DatabaseService.refresh_points_rollup_async(POINTS_ROLLUP_LAG_SECONDS)
+            if refreshed is not None:
+                period_leaderboard_cache.clear()
+                bump_resource("leaderboard:period")
+        except Exception as exc:
+            print(f"⚠️  Could not refresh points rollup: {exc}")
+        await asyncio.sleep(POINTS_ROLLUP_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_points_rollup():
+    if POINTS_ROLLUP_INTERVAL_SECONDS > 0:
+        app.state.points_rollup = asyncio.create_task(refresh_points_rollup())
+
+
+@app.on_event("startup")
+async def start_cache_invalidation():
+    """Listen for cache invalidations (NOTIFY) from other workers, the bot or manual SQL"""
+    start_listener()
+
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    """Close idle pooled connections on shutdown"""
+    stop_listener()
+    for name in ("leaderboard_refresh", "counter_reconciler", "points_rollup"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    get_pool().closeall()
+    await close_async_pool()
+    await telegram_api.close_session()
+
 # Feature detection flags
 ADMIN_PERMISSION_COLUMNS_SUPPORTED = True
 USER_TASK_SUBMISSION_TEXT_SUPPORTED = True
@@ -59,6 +206,7 @@ class UserResponse(BaseModel):
     points: int
     total_earned_points: int
     is_active: bool
+    completed_tasks_count: int = 0
 
 
 class TaskResponse(BaseModel):
@@ -71,6 +219,7 @@ class TaskResponse(BaseModel):
     points_reward: int
     is_bonus: bool
     is_active: bool
+    completions_count: int = 0
     
     # YouTube Settings Columns
     youtube_video_id: Optional[str] = None
@@ -171,9 +320,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify admin token"""
+    """Verify admin token (resolved admins are cached briefly, see app.cache.AdminCache)"""
+    token = credentials.credentials
+    admin = admin_cache.get(token)
+    if admin is not None:
+        return admin
+    version = admin_cache.version()
+    
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
@@ -186,7 +340,10 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
     if not response.data:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return response.data[0]
+    # The hash is only needed by login; keep it out of the cache and the routes
+    admin = {key: value for key, value in response.data[0].items() if key != "password_hash"}
+    admin_cache.put(token, admin, payload.get("exp"), version)
+    return admin
 
 
 def parse_permissions(raw_permissions) -> List[str]:
@@ -301,6 +458,8 @@ def update_admin_record(admin_id: str, payload: dict):
             working_payload = sanitize_permission_payload(payload)
             return supabase.table("admin_users").update(working_payload).eq("id", admin_id).execute()
         raise
+    finally:
+        admin_cache.invalidate(admin_id)
 
 
 def is_submission_text_error(error: Exception) -> bool:
@@ -339,6 +498,38 @@ def safe_user_task_insert(insert_data: dict):
         raise
 
 
+async def safe_user_task_update_async(update_data: dict, user_task_id: str):
+    """Async variant of safe_user_task_update"""
+    global USER_TASK_SUBMISSION_TEXT_SUPPORTED
+    working_payload = update_data.copy()
+    if not USER_TASK_SUBMISSION_TEXT_SUPPORTED:
+        working_payload.pop("submission_text", None)
+    try:
+        return await supabase.table("user_tasks").update(working_payload).eq("id", user_task_id).execute_async()
+    except Exception as exc:
+        if USER_TASK_SUBMISSION_TEXT_SUPPORTED and is_submission_text_error(exc):
+            USER_TASK_SUBMISSION_TEXT_SUPPORTED = False
+            working_payload.pop("submission_text", None)
+            return await supabase.table("user_tasks").update(working_payload).eq("id", user_task_id).execute_async()
+        raise
+
+
+async def safe_user_task_insert_async(insert_data: dict):
+    """Async variant of safe_user_task_insert"""
+    global USER_TASK_SUBMISSION_TEXT_SUPPORTED
+    working_payload = insert_data.copy()
+    if not USER_TASK_SUBMISSION_TEXT_SUPPORTED:
+        working_payload.pop("submission_text", None)
+    try:
+        return await supabase.table("user_tasks").insert(working_payload).execute_async()
+    except Exception as exc:
+        if USER_TASK_SUBMISSION_TEXT_SUPPORTED and is_submission_text_error(exc):
+            USER_TASK_SUBMISSION_TEXT_SUPPORTED = False
+            working_payload.pop("submission_text", None)
+            return await supabase.table("user_tasks").insert(working_payload).execute_async()
+        raise
+
+
 def enforce_manual_submission_rules(task_payload: dict):
     """Ensure manual review quests always use text/link submissions"""
     if task_payload.get("task_type") != "manual_review":
@@ -495,13 +686,50 @@ async def verify_token(admin=Depends(get_current_admin)):
     }
 
 
+# Cursor pagination: list endpoints return the token for the next page in
+# the X-Next-Cursor header; clients send it back as ?cursor=...
+USERS_SORT_KEY = ["created_at", "id"]
+USER_TASKS_SORT_KEY = ["created_at", "id"]
+USER_TASK_HISTORY_SORT_KEY = ["updated_at", "id"]
+NOTIFICATIONS_SORT_KEY = ["created_at", "id"]
+PAGE_MAX_LIMIT = 100
+
+
+def cursor_values(cursor: Optional[str], columns: list) -> Optional[list]:
+    """Decode a ?cursor= query parameter, 400 if it is malformed or its values aren't a timestamp / UUID"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, columns)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(response: Response, rows: list, limit: Optional[int], columns: list):
+    token = next_cursor(rows, limit, columns)
+    if token:
+        response.headers["X-Next-Cursor"] = token
+
+
 # User Endpoints
 
 @app.get("/api/users", response_model=List[UserResponse])
-async def get_users(skip: int = 0, limit: int = 100):
-    """Get all users"""
-    response = supabase.table("users").select("*").range(skip, skip + limit - 1).execute()
-    return response.data or []
+async def get_users(response: Response, skip: int = Query(0, ge=0),
+                    limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None):
+    """Get all users
+    
+    Prefer `cursor` over `skip`: each cursor page costs the same, while
+    `skip` (OFFSET) gets slower the deeper it goes.
+    """
+    after = cursor_values(cursor, USERS_SORT_KEY)
+    query = supabase.table("users").select("*").order("created_at").order("id")
+    if after:
+        query = query.after(USERS_SORT_KEY, after).limit(limit)
+    else:
+        query = query.range(skip, skip + limit - 1)
+    users = query.execute().data or []
+    set_next_cursor(response, users, limit, USERS_SORT_KEY)
+    return users
 
 
 @app.post("/api/users/init")
@@ -522,21 +750,53 @@ async def init_user(telegram_id: int, username: str = None, first_name: str = No
         "is_banned": False
     }
     
-    response = supabase.table("users").insert(user_data).execute()
-    if response.data:
-        return response.data[0]
+    user = DatabaseService.create_user(user_data)
+    if user:
+        return user
     raise HTTPException(status_code=500, detail="Failed to create user")
 
 
 @app.get("/api/users/{telegram_id}", response_model=UserResponse)
-async def get_user(telegram_id: int):
-    """Get user by Telegram ID"""
-    user = DatabaseService.get_user_by_telegram_id(telegram_id)
+async def get_user(telegram_id: int, fresh: bool = False):
+    """Get user by Telegram ID (fresh=true skips the user cache, e.g. to show an exact balance)"""
+    user = await DatabaseService.get_user_by_telegram_id_async(telegram_id, fresh=fresh)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
+@app.get("/api/users/{telegram_id}/rank")
+async def get_user_rank(telegram_id: int, around: int = Query(0, ge=0, le=50)):
+    """User's exact leaderboard rank (in-memory index), optionally with `around` neighbours each side"""
+    if not LEADERBOARD_INDEX_ENABLED:
+        result = await DatabaseService.get_user_rank_async(telegram_id, around)
+        if result is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return result
+    
+    if not leaderboard_index.ready:
+        await asyncio.to_thread(leaderboard_index.ensure_ready)
+    
+    user_id = leaderboard_index.user_id_for(telegram_id)
+    if user_id is None:
+        # Not ranked here yet (created by another process, banned or inactive)
+        user = await DatabaseService.get_user_by_telegram_id_async(telegram_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        leaderboard_index.upsert(user)
+        user_id = user["id"]
+    
+    rank = leaderboard_index.rank(user_id)
+    neighbours = leaderboard_index.around(user_id, around) if around and rank else []
+    return {
+        "telegram_id": telegram_id,
+        "rank": rank,
+        "points": next((entry["points"] for entry in leaderboard_index.around(user_id, 0)), None),
+        "total_ranked": len(leaderboard_index),
+        "around": neighbours,
+    }
+
+
 @app.get("/api/users/telegram/username/{username}")
 async def get_user_by_username(username: str):
     """Get user by Telegram username (for validation)"""
@@ -546,41 +806,20 @@ async def get_user_by_username(username: str):
         
         print(f"🔍 Looking up username: '{clean_username}'")
         
-        # Search in database - use eq with case-insensitive search
-        # First try exact match (case-sensitive)
-        response = supabase.table("users").select("*").eq("username", clean_username).execute()
+        # Case-insensitive match served by the lower(username) index
+        user = await DatabaseService.get_user_by_username_async(clean_username)
         
-        # If not found, try case-insensitive
-        if not response.data or len(response.data) == 0:
-            print(f"   Exact match not found, trying case-insensitive...")
-            response = supabase.table("users").select("*").execute()
-            
-            # Filter manually for case-insensitive match
-            matching_users = [
-                user for user in response.data 
-                if user.get('username', '').lower() == clean_username.lower()
-            ]
-            
-            if matching_users:
-                user = matching_users[0]
-                print(f"   ✅ Found user: {user.get('username')} (telegram_id: {user.get('telegram_id')})")
-                return {
-                    "telegram_id": user.get('telegram_id'),
-                    "username": user.get('username'),
-                    "found": True
-                }
-            else:
-                print(f"   ❌ No user found with username: {clean_username}")
-                raise HTTPException(status_code=404, detail="Username not found")
-        else:
-            user = response.data[0]
-            print(f"   ✅ Found user: {user.get('username')} (telegram_id: {user.get('telegram_id')})")
-            # Return minimal info for validation
-            return {
-                "telegram_id": user.get('telegram_id'),
-                "username": user.get('username'),
-                "found": True
-            }
+        if not user:
+            print(f"   ❌ No user found with username: {clean_username}")
+            raise HTTPException(status_code=404, detail="Username not found")
+        
+        print(f"   ✅ Found user: {user.get('username')} (telegram_id: {user.get('telegram_id')})")
+        # Return minimal info for validation
+        return {
+            "telegram_id": user.get('telegram_id'),
+            "username": user.get('username'),
+            "found": True
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -616,6 +855,8 @@ async def update_user_profile(telegram_id: int, data: dict):
             update_data['updated_at'] = datetime.utcnow().isoformat()
             
             result = supabase.table("users").update(update_data).eq("id", user['id']).execute()
+            user_cache.evict(user['id'])
+            bump_resource("leaderboard")
             
             if result.data:
                 return {"success": True, "message": "Profile updated successfully", "data": result.data[0]}
@@ -630,29 +871,42 @@ async def update_user_profile(telegram_id: int, data: dict):
 
 
 @app.get("/api/users/{telegram_id}/notifications")
-async def get_user_notifications(telegram_id: int, unread_only: bool = False):
-    """Get user notifications"""
+async def get_user_notifications(response: Response, telegram_id: int, unread_only: bool = False,
+                                 limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+                                 cursor: Optional[str] = None):
+    """Get user notifications (newest first, paginated when `limit` is given)"""
+    after = cursor_values(cursor, NOTIFICATIONS_SORT_KEY)
     user = DatabaseService.get_user_by_telegram_id(telegram_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    notifications = DatabaseService.get_user_notifications(user['id'], unread_only)
+    notifications = DatabaseService.get_user_notifications(user['id'], unread_only, limit=limit, after=after)
+    set_next_cursor(response, notifications, limit, NOTIFICATIONS_SORT_KEY)
     return notifications
 
 
 @app.get("/api/users/{telegram_id}/tasks")
-async def get_user_task_history(telegram_id: int):
-    """Get user's quest activity history"""
+async def get_user_task_history(response: Response, telegram_id: int,
+                                limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+                                cursor: Optional[str] = None):
+    """Get user's quest activity history (most recent first, paginated when `limit` is given)"""
+    after = cursor_values(cursor, USER_TASK_HISTORY_SORT_KEY)
     user = DatabaseService.get_user_by_telegram_id(telegram_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get all user tasks
-    user_tasks_response = supabase.table("user_tasks").select("*").eq("user_id", user['id']).order("updated_at", desc=True).execute()
+    query = supabase.table("user_tasks").select("*").eq("user_id", user['id'])
+    if after:
+        query = query.after(USER_TASK_HISTORY_SORT_KEY, after, desc=True)
+    query = query.order("updated_at", desc=True).order("id", desc=True)
+    if limit:
+        query = query.limit(limit)
+    user_tasks_response = query.execute()
+    set_next_cursor(response, user_tasks_response.data, limit, USER_TASK_HISTORY_SORT_KEY)
     
-    # Get all tasks to create a lookup map
-    tasks_response = supabase.table("tasks").select("*").execute()
-    tasks_map = {task['id']: task for task in tasks_response.data}
+    # Look up only the tasks on this page
+    task_ids = list({user_task['task_id'] for user_task in user_tasks_response.data if user_task.get('task_id')})
+    tasks_map = task_catalog.many(task_ids)
     
     # Format the response by combining user_tasks with task details
     activities = []
@@ -687,20 +941,23 @@ async def verify_task_completion(request: dict):
     if not telegram_id or not task_id:
         raise HTTPException(status_code=400, detail="telegram_id and task_id are required")
     
+    try:
+        telegram_id = int(telegram_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="telegram_id must be numeric")
+    
     # Get user
-    user = DatabaseService.get_user_by_telegram_id(telegram_id)
+    user = await DatabaseService.get_user_by_telegram_id_async(telegram_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get task
-    task_response = supabase.table("tasks").select("*").eq("id", task_id).eq("is_active", True).execute()
-    if not task_response.data:
+    task = await task_catalog.get_async(task_id)
+    if not task or not task.get('is_active'):
         raise HTTPException(status_code=404, detail="Task not found or inactive")
     
-    task = task_response.data[0]
-    
     # Check if user already completed this task
-    existing = supabase.table("user_tasks").select("*").eq("user_id", user['id']).eq("task_id", task_id).eq("status", "completed").execute()
+    existing = await supabase.table("user_tasks").select("*").eq("user_id", user['id']).eq("task_id", task_id).eq("status", "completed").execute_async()
     if existing.data:
         return {"success": False, "message": "Task already completed"}
     
@@ -773,8 +1030,6 @@ async def verify_task_completion(request: dict):
     # Telegram membership verification (telegram_join_group, telegram_join_channel, telegram)
     elif task_type.startswith('telegram_') or task_type == 'telegram' or task.get('platform') == 'telegram':
         try:
-            import requests
-            
             bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
             provided_username = request.get('telegram_username', '').strip().replace('@', '')
             
@@ -802,21 +1057,13 @@ async def verify_task_completion(request: dict):
                 print("❌ Chat ID not found in verification_data!")
                 return {"success": False, "message": "Chat ID not configured in task"}
             
-            # Use Telegram Bot API to check membership
-            url = f"https://api.telegram.org/bot{bot_token}/getChatMember"
-            params = {
-                "chat_id": chat_id,
-                "user_id": telegram_id
-            }
-            
-            print(f"   API URL: {url[:60]}...")
-            print(f"   Params: {params}")
+            # Use Telegram Bot API to check membership (awaited: the event loop keeps
+            # serving; repeated presses within the cache TTL don't reach Telegram)
+            print(f"   Params: chat_id={chat_id}, user_id={telegram_id}")
             print(f"   Calling Telegram Bot API...")
             
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
+            data = await telegram_api.get_chat_member(chat_id, telegram_id, bot_token)
             
-            print(f"   Response Status: {response.status_code}")
             print(f"   Response Data: {data}")
             
             if data.get('ok'):
@@ -857,53 +1104,33 @@ async def verify_task_completion(request: dict):
                         print(f"   ❌ User has no Telegram username")
                         return {"success": False, "message": verification_message}
                     
-                    # Step 1: Check against users.json file
-                    import json
-                    users_json_path = 'users.json'
+                    # Step 1: Check against users.json (indexed in memory, no file read per request)
                     users_json_valid = False
+                    user_in_json = user_registry.get(telegram_id)
                     
-                    try:
-                        if os.path.exists(users_json_path):
-                            with open(users_json_path, 'r') as f:
-                                users_data = json.load(f)
-                                
-                            # Check if user exists in users.json with matching telegram_id
-                            user_in_json = None
-                            for json_user in users_data.get('users', []):
-                                if str(json_user.get('telegram_id')) == str(telegram_id):
-                                    user_in_json = json_user
-                                    break
-                            
-                            if user_in_json:
-                                print(f"   ✅ User found in users.json")
-                                print(f"      - Stored username: {user_in_json.get('username', 'N/A')}")
-                                
-                                # Verify username matches (if both exist)
-                                stored_username = user_in_json.get('username', '').replace('@', '')
-                                if telegram_username and stored_username:
-                                    if stored_username.lower() == telegram_username.lower():
-                                        users_json_valid = True
-                                        print(f"   ✅ Username matches in users.json!")
-                                    else:
-                                        print(f"   ⚠️  Username mismatch: JSON has @{stored_username}, Telegram has @{telegram_username}")
-                                else:
-                                    # If no username to compare, just verify ID match is enough
-                                    users_json_valid = True
-                                    print(f"   ✅ Telegram ID matches in users.json!")
+                    if user_in_json:
+                        print(f"   ✅ User found in users.json")
+                        print(f"      - Stored username: {user_in_json.get('username', 'N/A')}")
+                        
+                        # Verify username matches (if both exist)
+                        stored_username = (user_in_json.get('username') or '').replace('@', '')
+                        if telegram_username and stored_username:
+                            if stored_username.lower() == telegram_username.lower():
+                                users_json_valid = True
+                                print(f"   ✅ Username matches in users.json!")
                             else:
-                                print(f"   ❌ User NOT found in users.json (telegram_id: {telegram_id})")
+                                print(f"   ⚠️  Username mismatch: JSON has @{stored_username}, Telegram has @{telegram_username}")
                         else:
-                            print(f"   ⚠️  users.json file not found - creating new one")
-                            users_data = {"users": []}
-                            
-                    except Exception as json_error:
-                        print(f"   ⚠️  Error reading users.json: {str(json_error)}")
-                        users_json_valid = False
+                            # If no username to compare, just verify ID match is enough
+                            users_json_valid = True
+                            print(f"   ✅ Telegram ID matches in users.json!")
+                    else:
+                        print(f"   ❌ User NOT found in users.json (telegram_id: {telegram_id})")
                     
                     # Step 2: Check against Supabase users table
                     database_valid = False
                     try:
-                        db_user = supabase.table("users").select("*").eq("telegram_id", str(telegram_id)).execute()
+                        db_user = await supabase.table("users").select("*").eq("telegram_id", telegram_id).execute_async()
                         
                         if db_user.data and len(db_user.data) > 0:
                             db_user_record = db_user.data[0]
@@ -965,16 +1192,10 @@ async def verify_task_completion(request: dict):
                             
                                 
                                 # Send message to the group
-                                send_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-                                send_params = {
-                                    "chat_id": chat_id,
-                                    "text": announcement,
-                                    "parse_mode": "Markdown"
-                                }
-                                
                                 print(f"   📢 Sending announcement to group...")
-                                announce_response = requests.post(send_url, json=send_params, timeout=10)
-                                announce_data = announce_response.json()
+                                announce_data = await telegram_api.send_message(
+                                    chat_id, announcement, bot_token, parse_mode="Markdown"
+                                )
                                 
                                 if announce_data.get('ok'):
                                     print(f"   ✅ Announcement sent successfully!")
@@ -1067,7 +1288,7 @@ async def verify_task_completion(request: dict):
                 }
             
             # Code is correct, check if already completed
-            existing_completion = supabase.table("user_tasks").select("*").eq("user_id", user['id']).eq("task_id", task_id).eq("status", "completed").execute()
+            existing_completion = await supabase.table("user_tasks").select("*").eq("user_id", user['id']).eq("task_id", task_id).eq("status", "completed").execute_async()
             if existing_completion.data:
                 return {"success": False, "message": "You have already completed this task"}
             
@@ -1102,7 +1323,7 @@ async def verify_task_completion(request: dict):
             # Optional: Use video_views tracking if table exists
             try:
                 # Check if user already has an active watch session
-                existing_view = supabase.table("video_views").select("*").eq("user_id", user['id']).eq("task_id", task_id).eq("status", "watching").execute()
+                existing_view = await supabase.table("video_views").select("*").eq("user_id", user['id']).eq("task_id", task_id).eq("status", "watching").execute_async()
                 
                 if existing_view.data and not submitted_code:
                     return {
@@ -1122,13 +1343,13 @@ async def verify_task_completion(request: dict):
                         "user_id": user['id'],
                         "task_id": task_id,
                         "video_id": video_id,
-                        "verification_code": secret_code,
+                        "verification_code": str(secret_code),
                         "status": "watching",
                         "started_at": datetime.now(timezone.utc).isoformat(),
                         "code_attempts": 0
                     }
                     
-                    view_response = supabase.table("video_views").insert(view_data).execute()
+                    view_response = await supabase.table("video_views").insert(view_data).execute_async()
                     
                     if view_response.data:
                         return {
@@ -1150,13 +1371,7 @@ async def verify_task_completion(request: dict):
     
     # Daily check-in
     elif task_type == 'daily_checkin':
-        # Check if user already checked in today
-        today = datetime.now(timezone.utc).date().isoformat()
-        recent_checkin = supabase.table("user_tasks").select("*").eq("user_id", user['id']).eq("task_id", task_id).eq("status", "completed").gte("completed_at", today).execute()
-        
-        if recent_checkin.data:
-            return {"success": False, "message": "Already checked in today! Come back tomorrow."}
-        
+        # Once per UTC day, enforced atomically by award_completion(p_repeatable)
         verification_success = True
         verification_message = "Daily check-in complete!"
     
@@ -1191,67 +1406,71 @@ async def verify_task_completion(request: dict):
             pending_status = pending_status or 'submitted'
         # For all other task types, needs_pending should already be set correctly above
         
+        status_value = pending_status if (needs_pending and pending_status) else ("pending" if needs_pending else "completed")
+        
+        # Completed tasks: mark done, award points and write the ledger in one call
+        if not needs_pending:
+            points_reward = task.get('points_reward', 0)
+            completion = await DatabaseService.award_completion_async(
+                user['id'],
+                task_id,
+                points_reward,
+                status=status_value,
+                proof_url=proof_url,
+                repeatable=task_type == 'daily_checkin'
+            )
+            if not completion["awarded"]:
+                if task_type == 'daily_checkin':
+                    return {"success": False, "message": "Already checked in today! Come back tomorrow."}
+                return {"success": False, "message": "Task already completed"}
+            
+            return {
+                "success": True,
+                "message": verification_message,
+                "points_earned": points_reward,
+                "new_total": completion["points"],
+                "status": status_value,
+                "pending_review": False
+            }
+        
         # Check if pending task exists
-        pending_task = supabase.table("user_tasks").select("*").eq("user_id", user['id']).eq("task_id", task_id).execute()
+        pending_task = await supabase.table("user_tasks").select("*").eq("user_id", user['id']).eq("task_id", task_id).execute_async()
         
-        status_value = pending_status if (needs_pending and pending_status) else ("pending" if needs_pending else "completed")
-
         if pending_task.data:
             # Update existing
             user_task_id = pending_task.data[0]['id']
             update_data = {
                 "status": status_value,
-                "completed_at": None if needs_pending else datetime.now(timezone.utc).isoformat()
+                "completed_at": None
             }
-            # Add points_earned for completed tasks
-            if not needs_pending:
-                update_data["points_earned"] = task.get('points_reward', 0)
             if proof_url:
                 update_data["proof_url"] = proof_url
             if submission_text:
                 update_data["submission_text"] = submission_text
             
-            safe_user_task_update(update_data, user_task_id)
+            await safe_user_task_update_async(update_data, user_task_id)
         else:
             # Create new
             user_task_data = {
                 "user_id": user['id'],
                 "task_id": task_id,
                 "status": status_value,
-                "completed_at": None if needs_pending else datetime.now(timezone.utc).isoformat()
+                "completed_at": None
             }
-            # Add points_earned for completed tasks
-            if not needs_pending:
-                user_task_data["points_earned"] = task.get('points_reward', 0)
             if proof_url:
                 user_task_data["proof_url"] = proof_url
             if submission_text:
                 user_task_data["submission_text"] = submission_text
             
-            safe_user_task_insert(user_task_data)
+            await safe_user_task_insert_async(user_task_data)
         
-        # Award points immediately for completed tasks (not YouTube or manual pending)
-        if not needs_pending:
-            points_reward = task.get('points_reward', 0)
-            new_points = user['points'] + points_reward
-            supabase.table("users").update({"points": new_points}).eq("id", user['id']).execute()
-            
-            return {
-                "success": True,
-                "message": verification_message,
-                "points_earned": points_reward,
-                "new_total": new_points,
-                "status": status_value,
-                "pending_review": False
-            }
-        else:
-            return {
-                "success": True,
-                "message": verification_message,
-                "status": status_value,
-                "pending_review": True,
-                "requires_code": task_type == 'youtube_watch'
-            }
+        return {
+            "success": True,
+            "message": verification_message,
+            "status": status_value,
+            "pending_review": True,
+            "requires_code": task_type == 'youtube_watch'
+        }
     
     return {"success": False, "message": verification_message}
 
@@ -1259,20 +1478,21 @@ async def verify_task_completion(request: dict):
 # Task Endpoints
 
 @app.get("/api/tasks", response_model=List[TaskResponse])
-async def get_tasks(active_only: bool = True):
-    """Get all tasks"""
-    if active_only:
-        tasks = DatabaseService.get_active_tasks()
-    else:
-        response = supabase.table("tasks").select("*").execute()
-        tasks = response.data or []
-    return tasks
+async def get_tasks(request: Request, active_only: bool = True):
+    """Get all tasks (ETag / If-None-Match aware)"""
+    async def load():
+        if active_only:
+            return await DatabaseService.get_active_tasks_async()
+        response = await supabase.table("tasks").select("*").execute_async()
+        return response.data or []
+    
+    return await cached_json(request, "tasks", f"active_only={active_only}", load, List[TaskResponse])
 
 
 @app.get("/api/tasks/{task_id}", response_model=TaskResponse)
 async def get_task(task_id: str):
     """Get task by ID"""
-    task = DatabaseService.get_task_by_id(task_id)
+    task = await task_catalog.get_async(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
@@ -1366,16 +1586,15 @@ async def create_task(task: TaskCreate, admin=Depends(get_current_admin)):
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to create task")
+        task_catalog.invalidate()
+        bump_resource("tasks")
         
-        # Notify all users about new task
-        users = supabase.table("users").select("id").eq("is_active", True).execute()
-        for user in users.data:
-            DatabaseService.create_notification(
-                user['id'],
-                "New Task Available!",
-                f"A new task '{task.title}' is available. Complete it to earn {task.points_reward} points!",
-                "new_task"
-            )
+        # Notify all users about new task (single INSERT ... SELECT)
+        DatabaseService.notify_active_users(
+            "New Task Available!",
+            f"A new task '{task.title}' is available. Complete it to earn {task.points_reward} points!",
+            "new_task"
+        )
         
         return response.data[0]
         
@@ -1455,6 +1674,8 @@ async def update_task(task_id: str, task: TaskCreate, admin=Depends(get_current_
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to update task")
+        task_catalog.invalidate()
+        bump_resource("tasks")
         
         return response.data[0]
         
@@ -1478,6 +1699,8 @@ async def update_task(task_id: str, task: TaskCreate, admin=Depends(get_current_
                 
                 if not response.data:
                     raise HTTPException(status_code=400, detail="Failed to update task")
+                task_catalog.invalidate()
+                bump_resource("tasks")
                 
                 return response.data[0]
             except Exception as inner_e:
@@ -1503,6 +1726,8 @@ async def toggle_task_status(task_id: str, admin=Depends(get_current_admin)):
     
     if not response.data:
         raise HTTPException(status_code=400, detail="Failed to toggle task status")
+    task_catalog.invalidate()
+    bump_resource("tasks")
     
     return {
         "message": f"Task {'activated' if new_status else 'deactivated'} successfully",
@@ -1519,29 +1744,54 @@ async def delete_task(task_id: str, admin=Depends(get_current_admin)):
     
     # Soft delete - just mark as inactive
     supabase.table("tasks").update({"is_active": False}).eq("id", task_id).execute()
+    task_catalog.invalidate()
+    bump_resource("tasks")
     return {"message": "Task deleted successfully"}
 
 
 # Leaderboard Endpoint
 
 @app.get("/api/leaderboard")
-async def get_leaderboard(limit: int = 10):
-    """Get leaderboard"""
-    leaderboard = DatabaseService.get_leaderboard(limit)
-    return leaderboard
+async def get_leaderboard(request: Request,
+                          limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_LIMIT),
+                          period: Optional[str] = None):
+    """Get leaderboard (top `limit` users with completed task counts, one query)
+    
+    period=week|month|season ranks by points earned in that period instead of
+    all-time points; rows then carry `period_points`. ETag / If-None-Match aware.
+    """
+    if period is None or period == "all":
+        return await cached_json(
+            request, "leaderboard", f"limit={limit}",
+            lambda: DatabaseService.get_leaderboard_async(limit),
+        )
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of: all, {', '.join(PERIODS)}")
+    try:
+        start, end = period_bounds(period)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return await cached_json(
+        request, "leaderboard:period", f"{period}:{start}:{end}:{limit}",
+        lambda: period_leaderboard_cache.get_or_load(
+            (period, start, end, limit),
+            lambda: DatabaseService.get_period_leaderboard_async(start, end, limit),
+        ),
+    )
 
 
 # Reward Endpoints
 
 @app.get("/api/rewards", response_model=List[RewardResponse])
-async def get_rewards(active_only: bool = True):
-    """Get all rewards"""
-    if active_only:
-        rewards = DatabaseService.get_active_rewards()
-    else:
-        response = supabase.table("rewards").select("*").execute()
-        rewards = response.data or []
-    return rewards
+async def get_rewards(request: Request, active_only: bool = True):
+    """Get all rewards (ETag / If-None-Match aware)"""
+    async def load():
+        if active_only:
+            return await DatabaseService.get_active_rewards_async()
+        response = await supabase.table("rewards").select("*").execute_async()
+        return response.data or []
+    
+    return await cached_json(request, "rewards", f"active_only={active_only}", load, List[RewardResponse])
 
 
 @app.post("/api/rewards", response_model=RewardResponse)
@@ -1553,6 +1803,7 @@ async def create_reward(reward: RewardCreate, admin=Depends(get_current_admin)):
     if not response.data:
         raise HTTPException(status_code=400, detail="Failed to create reward")
     
+    bump_resource("rewards")
     return response.data[0]
 
 
@@ -1565,65 +1816,102 @@ async def update_reward(reward_id: str, reward: RewardCreate, admin=Depends(get_
     if not response.data:
         raise HTTPException(status_code=404, detail="Reward not found")
     
+    bump_resource("rewards")
     return response.data[0]
 
 
 # Admin Endpoints
 
 @app.get("/api/admin/stats")
-async def get_stats(admin=Depends(get_current_admin)):
-    """Get system statistics (Admin only)"""
-    # Get user count
-    users_response = supabase.table("users").select("id", count="exact").execute()
-    total_users = users_response.count if users_response.count else 0
-    
-    # Get active users (last 7 days)
-    seven_days_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
-    active_users_response = supabase.table("activity_logs").select("user_id", count="exact").gte("created_at", seven_days_ago).execute()
-    active_users = len(set([log.get('user_id') for log in (active_users_response.data or [])]))
-    
-    # Get task count
-    tasks_response = supabase.table("tasks").select("id", count="exact").eq("is_active", True).execute()
-    total_tasks = tasks_response.count if tasks_response.count else 0
+async def get_stats(fresh: bool = False, admin=Depends(get_current_admin)):
+    """Get system statistics (Admin only)
     
-    # Get completed tasks count
-    completed_tasks_response = supabase.table("user_tasks").select("id", count="exact").eq("status", "completed").execute()
-    completed_tasks = completed_tasks_response.count if completed_tasks_response.count else 0
-    
-    # Get total points distributed
-    points_response = supabase.table("points_transactions").select("amount").eq("transaction_type", "earned").execute()
-    total_points = sum([t.get('amount', 0) for t in (points_response.data or [])])
-    
-    # Get rewards redeemed
-    rewards_response = supabase.table("user_rewards").select("id", count="exact").execute()
-    rewards_redeemed = rewards_response.count if rewards_response.count else 0
+    Reads the trigger-maintained counters (system_stats, one row);
+    fresh=true recomputes every figure from the base tables instead.
+    """
+    if not fresh:
+        return await DatabaseService.get_system_stats_async()
+    
+    # Exact recompute: aggregates run concurrently on the async pool and
+    # only scalars come back. Same definitions as the system_stats view:
+    # active users = activity on today or the 6 previous UTC days,
+    # completed tasks = user_tasks completed or verified.
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    active_since = today - timedelta(days=6)
+    (
+        users_response,
+        active_users_response,
+        tasks_response,
+        completed_tasks_response,
+        points_response,
+        rewards_response,
+    ) = await asyncio.gather(
+        supabase.table("users").count().execute_async(),
+        # Active users (last 7 UTC days)
+        supabase.table("activity_logs").count_distinct("user_id").gte("created_at", active_since).execute_async(),
+        supabase.table("tasks").count().eq("is_active", True).execute_async(),
+        supabase.table("user_tasks").count().in_("status", ["completed", "verified"]).execute_async(),
+        # Total points distributed
+        supabase.table("points_transactions").sum("amount").eq("transaction_type", "earned").execute_async(),
+        supabase.table("user_rewards").count().execute_async(),
+    )
     
     return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "total_points_distributed": total_points,
-        "rewards_redeemed": rewards_redeemed
+        "total_users": users_response.count or 0,
+        "active_users": active_users_response.count or 0,
+        "total_tasks": tasks_response.count or 0,
+        "completed_tasks": completed_tasks_response.count or 0,
+        "total_points_distributed": points_response.data[0]["sum"] or 0,
+        "rewards_redeemed": rewards_response.count or 0
+    }
+
+
+@app.get("/api/admin/db-metrics")
+async def get_db_metrics(limit: int = Query(20, ge=1, le=PAGE_MAX_LIMIT), reset: bool = False,
+                         admin=Depends(get_current_admin)):
+    """Top query shapes by total database time, per-route query counts and pool stats (Admin only)"""
+    metrics = db_metrics.snapshot(limit)
+    metrics["pool"] = get_pool().stats()
+    metrics["async_pool"] = async_pool_stats()
+    metrics["user_cache"] = user_cache.stats()
+    metrics["membership_cache"] = membership_cache.stats()
+    if reset:
+        db_metrics.reset()
+    return metrics
+
+
+@app.post("/api/admin/counters/reconcile")
+async def reconcile_completion_counters(admin=Depends(get_current_admin)):
+    """Recompute completion and system counters from the base tables now (Admin only)"""
+    return {
+        **await DatabaseService.reconcile_completion_counters_async(),
+        **await DatabaseService.reconcile_system_counters_async(),
     }
 
 
 @app.get("/api/admin/user-tasks")
-async def get_user_tasks(status: Optional[str] = None, admin=Depends(get_current_admin)):
-    """Get user tasks with filters (Admin only)"""
+async def get_user_tasks(response: Response, status: Optional[str] = None,
+                         limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT),
+                         cursor: Optional[str] = None, admin=Depends(get_current_admin)):
+    """Get user tasks with filters (Admin only), newest first"""
+    after = cursor_values(cursor, USER_TASKS_SORT_KEY)
     query = supabase.table("user_tasks").select("*")
     
     if status:
         query = query.eq("status", status)
+    if after:
+        query = query.after(USER_TASKS_SORT_KEY, after, desc=True)
     
-    user_tasks_response = query.order("created_at", desc=True).limit(100).execute()
+    user_tasks_response = query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute()
+    set_next_cursor(response, user_tasks_response.data, limit, USER_TASKS_SORT_KEY)
     
-    # Get users and tasks to create lookup maps
-    users_response = supabase.table("users").select("*").execute()
-    tasks_response = supabase.table("tasks").select("*").execute()
+    # Look up only the users and tasks referenced on this page
+    user_ids = list({user_task['user_id'] for user_task in user_tasks_response.data if user_task.get('user_id')})
+    task_ids = list({user_task['task_id'] for user_task in user_tasks_response.data if user_task.get('task_id')})
+    users_response = supabase.table("users").select("*").in_("id", user_ids).execute()
     
     users_map = {user['id']: user for user in users_response.data}
-    tasks_map = {task['id']: task for task in tasks_response.data}
+    tasks_map = task_catalog.many(task_ids)
     
     # Combine the data
     result = []
@@ -1647,47 +1935,42 @@ async def verify_user_task(user_task_id: str, approved: bool, admin=Depends(get_
     user_task = user_task_response.data[0]
     
     # Get task details
-    task_response = supabase.table("tasks").select("*").eq("id", user_task['task_id']).execute()
-    if not task_response.data:
+    task = task_catalog.get(user_task['task_id'])
+    if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = task_response.data[0]
-    
     if approved:
-        # Award points
+        # Complete the task, award points and notify in one round trip
         points = task['points_reward']
-        update_result = DatabaseService.update_user_points(user_task['user_id'], points, "earned")
-        if update_result is None:
-            raise HTTPException(status_code=500, detail="Failed to update user points")
-        
-        # Update user task
-        update_data = {
-            "status": "completed",
-            "points_earned": update_result.get("awarded_points", points),
-            "verified_at": datetime.utcnow().isoformat()
-        }
-        
-        # Notify user
-        DatabaseService.create_notification(
+        completion = DatabaseService.award_completion(
             user_task['user_id'],
-            "Task Verified!",
-            f"Your task has been verified! You earned {update_result.get('awarded_points', points)} points.",
-            "task_verified"
+            user_task['task_id'],
+            points,
+            status="completed",
+            notification_title="Task Verified!",
+            notification_message=f"Your task has been verified! You earned {points} points.",
+            mark_verified=True
         )
-    else:
-        # Reject task
-        update_data = {
-            "status": "rejected",
-            "verified_at": datetime.utcnow().isoformat()
-        }
+        if completion["points"] is None:
+            raise HTTPException(status_code=500, detail="Failed to update user points")
+        if not completion["awarded"]:
+            return {"message": "Task already completed"}
         
-        # Notify user
-        DatabaseService.create_notification(
-            user_task['user_id'],
-            "Task Rejected",
-            "Your task submission was rejected. Please try again.",
-            "system"
-        )
+        return {"message": "Task verification updated"}
+    
+    # Reject task
+    update_data = {
+        "status": "rejected",
+        "verified_at": datetime.utcnow().isoformat()
+    }
+    
+    # Notify user
+    DatabaseService.create_notification(
+        user_task['user_id'],
+        "Task Rejected",
+        "Your task submission was rejected. Please try again.",
+        "system"
+    )
     
     supabase.table("user_tasks").update(update_data).eq("id", user_task_id).execute()
     
@@ -1697,15 +1980,19 @@ async def verify_user_task(user_task_id: str, approved: bool, admin=Depends(get_
 @app.put("/api/admin/users/{user_id}/ban")
 async def ban_user(user_id: str, admin=Depends(get_current_admin)):
     """Ban/unban a user (Admin only)"""
-    user_response = supabase.table("users").select("is_banned").eq("id", user_id).execute()
+    user_response = supabase.table("users").select("*").eq("id", user_id).execute()
     
     if not user_response.data:
         raise HTTPException(status_code=404, detail="User not found")
     
-    current_status = user_response.data[0]['is_banned']
-    new_status = not current_status
+    user = user_response.data[0]
+    new_status = not user['is_banned']
     
     supabase.table("users").update({"is_banned": new_status}).eq("id", user_id).execute()
+    if LEADERBOARD_INDEX_ENABLED:
+        leaderboard_index.upsert({**user, "is_banned": new_status})
+    user_cache.evict(user_id)
+    bump_resource("leaderboard")
     
     return {"message": f"User {'banned' if new_status else 'unbanned'} successfully"}
 
@@ -1796,6 +2083,7 @@ async def delete_admin_user(
             raise HTTPException(status_code=403, detail="Cannot delete the main admin account")
 
         supabase.table("admin_users").delete().eq("id", admin_id).execute()
+        admin_cache.invalidate(admin_id)
         return {"message": "Admin user deleted successfully"}
     except HTTPException:
         raise
@@ -1878,12 +2166,10 @@ async def start_video_view(request: dict):
         raise HTTPException(status_code=400, detail="user_id and task_id are required")
     
     # Get task to extract verification code
-    task_response = supabase.table("tasks").select("*").eq("id", task_id).execute()
+    task = task_catalog.get(task_id)
     
-    if not task_response.data:
+    if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    task = task_response.data[0]
     verification_data = task.get('verification_data', {})
     
     if not verification_data or verification_data.get('method') != 'time_delay_code':
@@ -1932,11 +2218,9 @@ async def verify_video_code(request: dict):
     view = view_response.data[0]
     
     # Get task details
-    task_response = supabase.table("tasks").select("*").eq("id", view['task_id']).execute()
-    if not task_response.data:
+    task = task_catalog.get(view['task_id'])
+    if not task:
         return {"success": False, "error": "task_not_found", "message": "Task not found"}
-    
-    task = task_response.data[0]
     verification_data = task.get('verification_data', {})
     
     min_watch_time = verification_data.get('min_watch_time_seconds', 120)
@@ -1997,42 +2281,23 @@ async def verify_video_code(request: dict):
         "completed_at": now.isoformat()
     }).eq("id", view['id']).execute()
     
-    # Check if user already completed this task
-    existing_completion = supabase.table("user_tasks").select("*").eq("user_id", user_id).eq("task_id", task['id']).execute()
+    # Complete the task, award points and notify in one round trip
+    completion = DatabaseService.award_completion(
+        user_id,
+        task['id'],
+        task['points_reward'],
+        status="verified",
+        notification_title="Quest Completed!",
+        notification_message=f"You earned {task['points_reward']} points for completing '{task['title']}'"
+    )
     
-    if existing_completion.data:
+    if not completion["awarded"]:
         return {
             "success": False,
             "error": "already_completed",
             "message": "You have already completed this task"
         }
     
-    # Complete the task
-    user_task_data = {
-        "user_id": user_id,
-        "task_id": task['id'],
-        "status": "verified",
-        "points_earned": task['points_reward'],
-        "completed_at": now.isoformat()
-    }
-    supabase.table("user_tasks").insert(user_task_data).execute()
-    
-    # Update user points
-    user_response = supabase.table("users").select("points").eq("id", user_id).execute()
-    current_points = user_response.data[0]['points'] if user_response.data else 0
-    new_points = current_points + task['points_reward']
-    
-    supabase.table("users").update({"points": new_points}).eq("id", user_id).execute()
-    
-    # Create notification
-    notification_data = {
-        "user_id": user_id,
-        "title": "Quest Completed!",
-        "message": f"You earned {task['points_reward']} points for completing '{task['title']}'",
-        "type": "task_verified"
-    }
-    supabase.table("notifications").insert(notification_data).execute()
-    
     return {
         "success": True,
         "message": "Video quest completed successfully!",
@@ -2085,12 +2350,10 @@ async def verify_twitter_action(request: dict):
             }
     
     # Get task details
-    task_response = supabase.table("tasks").select("*").eq("id", task_id).execute()
-    if not task_response.data:
+    task = task_catalog.get(task_id)
+    if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = task_response.data[0]
-    
     # Verify based on type
     result = None
     verified = False
@@ -2161,6 +2424,7 @@ async def verify_twitter_action(request: dict):
             "twitter_verified": True,
             "twitter_verified_at": now.isoformat()
         }).eq("id", user_id).execute()
+        user_cache.evict(user_id)
     
     # If not verified, return failure
     if not verified:
@@ -2170,11 +2434,17 @@ async def verify_twitter_action(request: dict):
             "message": f"Twitter {verification_type} not detected. Please complete the action and try again."
         }
     
-    # If verified, complete the task
-    # Check if already completed
-    existing_completion = supabase.table("user_tasks").select("*").eq("user_id", user_id).eq("task_id", task_id).execute()
+    # If verified, complete the task, award points and notify in one round trip
+    completion = DatabaseService.award_completion(
+        user_id,
+        task_id,
+        task['points_reward'],
+        status="verified",
+        notification_title="Twitter Quest Completed!",
+        notification_message=f"You earned {task['points_reward']} points for completing '{task['title']}'"
+    )
     
-    if existing_completion.data:
+    if not completion["awarded"]:
         return {
             "success": True,
             "verified": True,
@@ -2182,40 +2452,6 @@ async def verify_twitter_action(request: dict):
             "message": "Task already completed"
         }
     
-    # Complete the task
-    user_task_data = {
-        "user_id": user_id,
-        "task_id": task_id,
-        "status": "verified",
-        "points_earned": task['points_reward'],
-        "completed_at": now.isoformat(),
-        "verified_at": now.isoformat()
-    }
-    supabase.table("user_tasks").insert(user_task_data).execute()
-    
-    # Update user points
-    user_response = supabase.table("users").select("points, total_earned_points").eq("id", user_id).execute()
-    if user_response.data:
-        current_points = user_response.data[0]['points']
-        total_earned = user_response.data[0].get('total_earned_points', 0)
-        
-        new_points = current_points + task['points_reward']
-        new_total_earned = total_earned + task['points_reward']
-        
-        supabase.table("users").update({
-            "points": new_points,
-            "total_earned_points": new_total_earned
-        }).eq("id", user_id).execute()
-    
-    # Create notification
-    notification_data = {
-        "user_id": user_id,
-        "title": "Twitter Quest Completed!",
-        "message": f"You earned {task['points_reward']} points for completing '{task['title']}'",
-        "type": "task_verified"
-    }
-    supabase.table("notifications").insert(notification_data).execute()
-    
     return {
         "success": True,
         "verified": True,
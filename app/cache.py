@@ -0,0 +1,192 @@
+"""
+Caches of user and admin rows
+
+Both live in the shared cache backend (app.cache_backend), so with
+CACHE_BACKEND=redis every worker reads and invalidates the same entries.
+
+Almost every user-facing route and bot action starts with
+get_user_by_telegram_id. UserCache keeps recently used users rows for a
+short TTL, reachable by telegram_id and by id.
+
+Staleness rules:
+
+- points changes (award_points, award_completion, redeem_reward) and profile
+  updates evict the user in the writing worker once their transaction
+  commits;
+- balance changes, bans and deactivations made anywhere - this worker,
+  another worker, the bot, manual SQL - evict the user in every worker via
+  NOTIFY user_cache (database/migrations/012_user_cache_notify.sql), so the
+  balance and the ban flag are not served stale while the listener is
+  connected (with it down, they can lag by up to USER_CACHE_TTL_SECONDS);
+- other changes made outside DatabaseService (manual SQL, scripts) show
+  up within USER_CACHE_TTL_SECONDS. Reads that must see the exact balance
+  pass fresh=True and go to the database.
+
+Missing users are not cached, so a user created right after a miss is found.
+Every eviction bumps a generation token; readers capture it before querying
+and put() drops the row if it changed meanwhile, so a row read just before
+a write can't be cached after that write's eviction.
+
+AdminCache maps bearer tokens to admin_users rows so get_current_admin skips
+jwt.decode and the admin lookup on repeat calls. Entries end at
+ADMIN_CACHE_TTL_SECONDS or the token's own expiry, whichever is first, and any
+change to admin_users (update, delete, permissions, login) invalidates every
+cached admin via NOTIFY admin_cache
+(database/migrations/013_admin_cache_notify.sql).
+"""
+import hashlib
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.cache_backend import CacheBackend, get_backend
+from app.db_listener import subscribe
+
+load_dotenv()
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))  # 0 disables caching
+USER_CACHE_CHANNEL = "user_cache"
+
+ADMIN_CACHE_TTL_SECONDS = float(os.getenv("ADMIN_CACHE_TTL_SECONDS", "60"))  # 0 disables caching
+ADMIN_CACHE_CHANNEL = "admin_cache"
+
+
+class UserCache:
+    """users rows by id, with a telegram_id -> id index"""
+
+    PREFIX = "user:"
+    GENERATION_KEY = "user:generation"
+
+    def __init__(self, ttl: float = USER_CACHE_TTL_SECONDS, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_backend()
+
+    def get_by_id(self, user_id: str) -> Optional[dict]:
+        if self.ttl <= 0:
+            return None
+        user = self.backend.get(f"{self.PREFIX}id:{user_id}")
+        if user is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(user)
+
+    def get_by_telegram_id(self, telegram_id: int) -> Optional[dict]:
+        if self.ttl <= 0:
+            return None
+        # An evicted row leaves the index entry pointing at nothing: a miss
+        user_id = self.backend.get(f"{self.PREFIX}tg:{int(telegram_id)}")
+        if user_id is None:
+            self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def generation(self) -> str:
+        """Read before querying a user; pass to put()"""
+        return self.backend.version(self.GENERATION_KEY)
+
+    def put(self, user: Optional[dict], generation: Optional[str] = None):
+        """Cache a row read under `generation` (skipped if anything was evicted since)"""
+        if not user or self.ttl <= 0:
+            return
+        if generation is not None and generation != self.generation():
+            return
+        self.backend.set(f"{self.PREFIX}id:{user['id']}", dict(user), self.ttl)
+        if user.get("telegram_id") is not None:
+            self.backend.set(f"{self.PREFIX}tg:{int(user['telegram_id'])}", user["id"], self.ttl)
+        # An eviction between the check and the set: drop what was just written
+        if generation is not None and generation != self.generation():
+            self.backend.delete(f"{self.PREFIX}id:{user['id']}")
+
+    def evict(self, user_id: str):
+        self.backend.bump_version(self.GENERATION_KEY)
+        self.backend.delete(f"{self.PREFIX}id:{user_id}")
+
+    def clear(self):
+        self.backend.clear(self.PREFIX)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache()
+
+
+def evict_user(user_id: str):
+    """Drop a user once the current transaction commits (right away outside one)"""
+    from app.models import on_commit
+    on_commit(lambda: user_cache.evict(user_id))
+
+
+def _on_user_notify(payload: Optional[str]):
+    if payload is None:
+        user_cache.clear()
+    else:
+        user_cache.evict(payload)
+
+
+subscribe(USER_CACHE_CHANNEL, _on_user_notify)
+
+
+class AdminCache:
+    """Bearer token -> admin_users row, short-lived"""
+
+    PREFIX = "admin:"
+    VERSION_KEY = "admin:version"
+
+    def __init__(self, ttl: float = ADMIN_CACHE_TTL_SECONDS, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self._backend = backend
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_backend()
+
+    def _key(self, token: str) -> str:
+        # Tokens are credentials: only their digest is used as a key
+        return f"{self.PREFIX}token:{hashlib.sha256(token.encode()).hexdigest()}"
+
+    def version(self) -> str:
+        """Read before looking an admin up; pass to put()"""
+        return self.backend.version(self.VERSION_KEY)
+
+    def get(self, token: str) -> Optional[dict]:
+        if self.ttl <= 0:
+            return None
+        entry = self.backend.get(self._key(token))
+        if entry is None:
+            return None
+        admin, version, expires_at = entry
+        if expires_at < time.time() or version != self.version():
+            return None
+        return dict(admin)
+
+    def put(self, token: str, admin: dict, token_expires_at: Optional[float] = None,
+            version: Optional[str] = None):
+        """Cache a resolved admin under the version read before the lookup"""
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, float(token_expires_at))
+        if expires_at <= time.time():
+            return
+        version = version if version is not None else self.version()
+        self.backend.set(self._key(token), (dict(admin), version, expires_at), expires_at - time.time())
+
+    def invalidate(self, admin_id: Optional[str] = None):
+        """Forget every cached admin (admin changes are rare; one write covers all workers)"""
+        self.backend.bump_version(self.VERSION_KEY)
+
+
+admin_cache = AdminCache()
+
+subscribe(ADMIN_CACHE_CHANNEL, admin_cache.invalidate)
@@ -0,0 +1,273 @@
+"""
+Pluggable cache / shared-state backend
+
+Caches, rate limits and quota counters keep their state in a CacheBackend
+instead of process memory, so several uvicorn workers or Cloud Run
+instances can share it:
+
+- MemoryBackend (default): process-local, bounded LRU with per-key TTL.
+  Fine for a single worker.
+- RedisBackend (CACHE_BACKEND=redis): any Redis-protocol server at
+  REDIS_URL (Redis, Valkey, KeyDB, Memorystore...). Counters are native
+  Redis integers so increments are atomic across workers. Any redis-py
+  compatible client can be passed in, e.g. fakeredis.FakeRedis() as a
+  local stand-in.
+
+One Redis is shared by separately built images (API, bots), so values are
+stored as JSON rather than pickled: decoding never imports application
+classes. Cache values must therefore be JSON-safe - dicts, lists, strings,
+numbers, booleans, None - plus datetime, date, Decimal and bytes, which
+are tagged and restored. Tuples come back as lists.
+
+Backend failures, including values that can't be encoded or decoded, are
+logged and treated as cache misses, never as request errors.
+"""
+import base64
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()  # memory | redis
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "brgy:")
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "50000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {"__type__": "date", "value": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__type__": "decimal", "value": str(value)}
+    if isinstance(value, bytes):
+        return {"__type__": "bytes", "value": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON-safe")
+
+
+def _json_object_hook(obj: dict):
+    kind = obj.get("__type__")
+    if kind == "datetime":
+        return datetime.fromisoformat(obj["value"])
+    if kind == "date":
+        return date.fromisoformat(obj["value"])
+    if kind == "decimal":
+        return Decimal(obj["value"])
+    if kind == "bytes":
+        return base64.b64decode(obj["value"])
+    return obj
+
+
+def encode_value(value: Any) -> bytes:
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+
+def decode_value(raw: bytes) -> Any:
+    return json.loads(raw, object_hook=_json_object_hook)
+
+
+class CacheBackend(ABC):
+    """Key/value store with per-key TTL and atomic counters"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Value stored under key, or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store value; ttl in seconds (None keeps it until evicted)"""
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        """Drop keys (missing keys are ignored)"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add amount to a counter and return the new value
+
+        A counter created by this call expires after ttl; incrementing an
+        existing counter keeps its expiry.
+        """
+
+    @abstractmethod
+    def get_counter(self, key: str) -> int:
+        """Current value of a counter (0 if missing)"""
+
+    @abstractmethod
+    def clear(self, prefix: str = ""):
+        """Drop every key starting with prefix (every key this backend owns by default)"""
+
+    # Versioned groups: entries store the version they were read under and
+    # are ignored once it changes, so a whole group is invalidated with one
+    # write and a lookup that raced with the invalidation is never served.
+
+    def version(self, key: str) -> str:
+        value = self.get(key)
+        if value is None:
+            value = uuid.uuid4().hex
+            self.set(key, value)
+        return value
+
+    def bump_version(self, key: str):
+        self.set(key, uuid.uuid4().hex)
+
+
+class MemoryBackend(CacheBackend):
+    """Process-local backend: bounded LRU with per-key TTL"""
+
+    def __init__(self, maxsize: int = CACHE_MEMORY_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at or None, value)
+
+    def _live(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[1] if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl if ttl else None)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                value, expires_at = amount, time.monotonic() + ttl if ttl else None
+            else:
+                value, expires_at = entry[1] + amount, entry[0]
+            self._store(key, value, expires_at)
+            return value
+
+    def get_counter(self, key: str) -> int:
+        return self.get(key) or 0
+
+    def clear(self, prefix: str = ""):
+        with self._lock:
+            if not prefix:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+class RedisBackend(CacheBackend):
+    """Shared backend on a Redis-protocol server"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = CACHE_KEY_PREFIX, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self.client.get(self._key(key))
+            return decode_value(raw) if raw is not None else None
+        except Exception as exc:
+            # Unreachable server or an entry this image can't decode: a miss
+            logger.warning("Cache get failed for %s: %s", key, exc)
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            self.client.set(self._key(key), encode_value(value), px=int(ttl * 1000) if ttl else None)
+        except Exception as exc:
+            logger.warning("Cache set failed for %s: %s", key, exc)
+
+    def delete(self, *keys: str):
+        if not keys:
+            return
+        try:
+            self.client.delete(*(self._key(key) for key in keys))
+        except Exception as exc:
+            logger.warning("Cache delete failed for %s: %s", keys, exc)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        full_key = self._key(key)
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            if ttl:
+                pipe.set(full_key, 0, px=int(ttl * 1000), nx=True)
+            pipe.incrby(full_key, amount)
+            return int(pipe.execute()[-1])
+        except Exception as exc:
+            logger.warning("Cache incr failed for %s: %s", key, exc)
+            return 0
+
+    def get_counter(self, key: str) -> int:
+        try:
+            raw = self.client.get(self._key(key))
+        except Exception as exc:
+            logger.warning("Cache get failed for %s: %s", key, exc)
+            return 0
+        return int(raw) if raw is not None else 0
+
+    def clear(self, prefix: str = ""):
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}{prefix}*", count=1000))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as exc:
+            logger.warning("Cache clear failed: %s", exc)
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> CacheBackend:
+    """The process-wide backend selected by CACHE_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend() if CACHE_BACKEND == "redis" else MemoryBackend()
+    return _backend
+
+
+def set_backend(backend: CacheBackend):
+    """Swap the backend (tests, scripts)"""
+    global _backend
+    _backend = backend
@@ -0,0 +1,127 @@
+"""
+Async PostgreSQL pool (asyncpg) used by SimpleTable.execute_async()
+
+Rows come back in the same shape as the psycopg2 path: plain dicts with
+UUIDs as strings, JSONB as Python objects and timestamps as datetimes.
+Parameters are accepted as loosely as psycopg2 accepts them: timestamps as
+ISO strings (how most of the code base passes them), any value for a text
+column (e.g. a code stored as a number in task JSON) and numeric strings
+for integer columns.
+"""
+import asyncio
+import json
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import asyncpg
+
+from app.db_metrics import InstrumentedAsyncConnection
+from app.db_pool import (
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_IDLE,
+)
+
+_pool = None
+_pool_lock = None
+
+_stats = {
+    "acquires": 0,
+    "wait_time_total": 0.0,
+    "wait_time_max": 0.0,
+}
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+def to_asyncpg_query(query: str) -> str:
+    """Convert psycopg2 %s placeholders into asyncpg $1, $2, ... placeholders"""
+    counter = iter(range(1, 10_000))
+    return _PLACEHOLDER.sub(lambda _: f"${next(counter)}", query)
+
+
+def _encode_timestamp(value) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+async def _init_connection(conn):
+    """Register text codecs so values round-trip like they do with psycopg2"""
+    await conn.set_type_codec("uuid", encoder=str, decoder=str, schema="pg_catalog", format="text")
+    await conn.set_type_codec("json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog", format="text")
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog", format="text")
+    for type_name in ("timestamptz", "timestamp"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=_encode_timestamp,
+            decoder=datetime.fromisoformat,
+            schema="pg_catalog",
+            format="text",
+        )
+    await conn.set_type_codec("date", encoder=_encode_timestamp, decoder=date.fromisoformat, schema="pg_catalog", format="text")
+    # psycopg2 interpolates literals and lets the server coerce them; asyncpg
+    # binds typed values and rejects e.g. an int for a text column
+    for type_name in ("text", "varchar", "bpchar"):
+        await conn.set_type_codec(type_name, encoder=str, decoder=str, schema="pg_catalog", format="text")
+    for type_name in ("int2", "int4", "int8"):
+        await conn.set_type_codec(type_name, encoder=str, decoder=int, schema="pg_catalog", format="text")
+
+
+async def get_async_pool() -> asyncpg.Pool:
+    """Return the asyncpg pool for the running event loop, creating it on first use"""
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                DATABASE_URL,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=DB_POOL_MAX_IDLE,
+                init=_init_connection,
+            )
+    return _pool
+
+
+@asynccontextmanager
+async def acquire():
+    """Acquire a pooled async connection, recording how long we waited for it"""
+    pool = await get_async_pool()
+    start = time.perf_counter()
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        waited = time.perf_counter() - start
+        _stats["acquires"] += 1
+        _stats["wait_time_total"] += waited
+        _stats["wait_time_max"] = max(_stats["wait_time_max"], waited)
+        yield InstrumentedAsyncConnection(conn)
+
+
+async def close_async_pool():
+    """Close the async pool (called on API shutdown)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def async_pool_stats() -> dict:
+    """Async pool metrics for monitoring"""
+    acquires = _stats["acquires"]
+    stats = {
+        "acquires": acquires,
+        "wait_time_total_ms": round(_stats["wait_time_total"] * 1000, 2),
+        "wait_time_avg_ms": round(_stats["wait_time_total"] * 1000 / acquires, 3) if acquires else 0.0,
+        "wait_time_max_ms": round(_stats["wait_time_max"] * 1000, 2),
+    }
+    if _pool is not None:
+        stats["size"] = _pool.get_size()
+        stats["idle"] = _pool.get_idle_size()
+    return stats
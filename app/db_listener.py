@@ -0,0 +1,104 @@
+"""
+PostgreSQL LISTEN/NOTIFY dispatcher for in-process caches
+
+Caches that must notice writes made by other workers, the bot or manual SQL
+subscribe a callback to a channel; triggers in the database send
+NOTIFY <channel>, '<payload>' on commit. One listener thread per process
+holds a dedicated connection (outside the pool) and calls each channel's
+callbacks with the payload.
+
+After the connection is (re)established every callback is called with
+payload None: notifications sent while disconnected are lost, so
+subscribers should drop everything they hold.
+"""
+import logging
+import os
+import select
+import threading
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DB_NOTIFY_LISTEN = os.getenv("DB_NOTIFY_LISTEN", "true").lower() == "true"
+
+_handlers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+
+
+def subscribe(channel: str, callback: Callable[[Optional[str]], None]):
+    """Call callback(payload) for every NOTIFY on channel (payload None after a reconnect)"""
+    _handlers.setdefault(channel, []).append(callback)
+
+
+def _dispatch(channel: str, payload: Optional[str]):
+    for callback in _handlers.get(channel, []):
+        try:
+            callback(payload)
+        except Exception as exc:
+            logger.warning("NOTIFY handler for %s failed: %s", channel, exc)
+
+
+class NotificationListener(threading.Thread):
+    """Background thread LISTENing on every subscribed channel"""
+
+    def __init__(self, dsn: str, poll_seconds: float = 5.0):
+        super().__init__(name="db-notify-listener", daemon=True)
+        self.dsn = dsn
+        self.poll_seconds = poll_seconds
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        backoff = 1.0
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                cursor = conn.cursor()
+                for channel in _handlers:
+                    cursor.execute(f"LISTEN {channel}")
+                # Changes made while we were not listening were missed
+                for channel in _handlers:
+                    _dispatch(channel, None)
+                backoff = 1.0
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        _dispatch(notify.channel, notify.payload)
+            except Exception as exc:
+                logger.warning("Database notification listener disconnected: %s", exc)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+_listener: Optional[NotificationListener] = None
+
+
+def start_listener(dsn: Optional[str] = None):
+    """Start the listener thread (once per process)"""
+    global _listener
+    if not DB_NOTIFY_LISTEN or not _handlers or (_listener is not None and _listener.is_alive()):
+        return
+    _listener = NotificationListener(dsn or os.getenv("DATABASE_URL"))
+    _listener.start()
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
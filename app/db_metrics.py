@@ -0,0 +1,321 @@
+"""
+Query instrumentation for the database layer
+
+Every statement that runs on a pooled connection - psycopg2 (app.db_pool)
+or asyncpg (app.db_async) - is recorded here with its duration, row count,
+normalized SQL shape and the API route that issued it. The data feeds:
+
+- per-shape totals, served by GET /api/admin/db-metrics
+- a per-request query budget (warns when a request issues too many queries
+  or spends too long in the database)
+- a slow-query log
+- an opt-in N+1 detector (DB_N_PLUS_ONE_DETECT=true) that warns when one
+  request issues the same query shape over and over with different
+  parameters, e.g. one lookup per row of a list
+"""
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DB_METRICS_ENABLED = os.getenv("DB_METRICS_ENABLED", "true").lower() == "true"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))  # log statements slower than this
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "20"))  # queries per request, 0 disables
+DB_QUERY_TIME_BUDGET_MS = float(os.getenv("DB_QUERY_TIME_BUDGET_MS", "500"))  # DB time per request, 0 disables
+DB_METRICS_MAX_SHAPES = int(os.getenv("DB_METRICS_MAX_SHAPES", "500"))
+DB_METRICS_HEADERS = os.getenv("DB_METRICS_HEADERS", "false").lower() == "true"  # X-DB-* on responses (debug)
+
+# N+1 detection (development / test)
+DB_N_PLUS_ONE_DETECT = os.getenv("DB_N_PLUS_ONE_DETECT", "false").lower() == "true"
+DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "5"))  # same shape, distinct params, per request
+DB_N_PLUS_ONE_RAISE = os.getenv("DB_N_PLUS_ONE_RAISE", "false").lower() == "true"  # fail fast in tests
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_INTERNAL_FILES = {"db_metrics.py", "db_pool.py", "db_async.py"}
+
+NO_ROUTE = "-"  # queries issued outside an API request (startup, scripts, bot)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\$\d+")
+_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_VALUES = re.compile(r"(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.IGNORECASE)
+_CURSOR_NAME = re.compile(r"\bstream_[0-9a-f]{32}\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query) -> str:
+    """Reduce a statement to its shape: literals and parameters become ?"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    shape = str(query)
+    shape = _STRING.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _CURSOR_NAME.sub("stream_?", shape)
+    shape = _LIST.sub("(...)", shape)
+    shape = _VALUES.sub(r"\1", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class NPlusOneQuery(Exception):
+    """Raised instead of warning when DB_N_PLUS_ONE_RAISE is set"""
+
+
+class RequestQueries:
+    """Queries issued while serving one API request"""
+
+    def __init__(self, route):
+        self._route = route
+        self.count = 0
+        self.total_ms = 0.0
+        self.shape_params = {}  # shape -> distinct parameter fingerprints (N+1 detection)
+        self.n_plus_one = set()  # shapes already reported for this request
+
+    @property
+    def route(self) -> str:
+        # A callable is resolved on use: the API only knows the matched route
+        # once routing has run
+        return self._route() if callable(self._route) else self._route
+
+
+_current_request = ContextVar("db_request", default=None)
+
+_lock = threading.Lock()
+_shapes = {}  # shape -> totals
+_routes = {}  # route -> totals
+_n_plus_one = {}  # (route, shape) -> times detected
+_since = time.time()
+
+
+def start_request(route):
+    """Begin tracking a request; returns a token for end_request()
+
+    route is a name, or a callable returning it when queries are recorded.
+    """
+    return _current_request.set(RequestQueries(route))
+
+
+def end_request(token) -> RequestQueries:
+    """Stop tracking the current request, check its budget and return its totals"""
+    state = _current_request.get()
+    _current_request.reset(token)
+    if state is None or not DB_METRICS_ENABLED:
+        return state
+
+    over_count = DB_QUERY_BUDGET and state.count > DB_QUERY_BUDGET
+    over_time = DB_QUERY_TIME_BUDGET_MS and state.total_ms > DB_QUERY_TIME_BUDGET_MS
+    with _lock:
+        route = _routes.setdefault(state.route, {
+            "requests": 0, "queries": 0, "total_ms": 0.0, "max_queries": 0, "over_budget": 0,
+        })
+        route["requests"] += 1
+        route["queries"] += state.count
+        route["total_ms"] += state.total_ms
+        route["max_queries"] = max(route["max_queries"], state.count)
+        if over_count or over_time:
+            route["over_budget"] += 1
+    if over_count or over_time:
+        logger.warning(
+            "Query budget exceeded on %s: %d queries, %.1f ms in the database (budget %d queries / %.0f ms)",
+            state.route, state.count, state.total_ms, DB_QUERY_BUDGET, DB_QUERY_TIME_BUDGET_MS,
+        )
+    return state
+
+
+def current_request():
+    return _current_request.get()
+
+
+@contextmanager
+def track_queries(name: str):
+    """Treat a block as one request (scripts, bot handlers, tests)"""
+    token = start_request(name)
+    try:
+        yield _current_request.get()
+    finally:
+        end_request(token)
+
+
+def _stack_summary(limit: int = 8) -> str:
+    """Project frames that led to the current query, innermost last"""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_PROJECT_ROOT)
+        and os.path.basename(frame.filename) not in _INTERNAL_FILES
+    ]
+    return "".join(traceback.format_list(frames[-limit:]))
+
+
+def _check_n_plus_one(state: RequestQueries, shape: str, params):
+    """Flag a shape issued more than DB_N_PLUS_ONE_THRESHOLD times with different parameters"""
+    if shape in state.n_plus_one:
+        return
+    seen = state.shape_params.setdefault(shape, set())
+    seen.add(repr(params))
+    if len(seen) <= DB_N_PLUS_ONE_THRESHOLD:
+        return
+
+    state.n_plus_one.add(shape)
+    with _lock:
+        key = (state.route, shape)
+        _n_plus_one[key] = _n_plus_one.get(key, 0) + 1
+    message = (
+        f"Possible N+1 on {state.route}: {len(seen)} queries with the same shape and different "
+        f"parameters: {shape}\n{_stack_summary()}"
+    )
+    if DB_N_PLUS_ONE_RAISE:
+        raise NPlusOneQuery(message)
+    logger.warning(message)
+
+
+def record_query(query, elapsed: float, rows: int = -1, params=None):
+    """Record one executed statement (elapsed in seconds)"""
+    if not DB_METRICS_ENABLED:
+        return
+    elapsed_ms = elapsed * 1000
+    shape = normalize_sql(query)
+    state = _current_request.get()
+    route = state.route if state is not None else NO_ROUTE
+    if state is not None:
+        state.count += 1
+        state.total_ms += elapsed_ms
+
+    with _lock:
+        stats = _shapes.get(shape)
+        if stats is None:
+            if len(_shapes) >= DB_METRICS_MAX_SHAPES:
+                shape = "<other>"
+                stats = _shapes.get(shape)
+            if stats is None:
+                stats = _shapes[shape] = {
+                    "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "routes": {},
+                }
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if rows and rows > 0:
+            stats["rows"] += rows
+        stats["routes"][route] = stats["routes"].get(route, 0) + 1
+
+    if DB_SLOW_QUERY_MS and elapsed_ms >= DB_SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms, %s rows) on %s: %s", elapsed_ms, rows, route, shape)
+
+    if DB_N_PLUS_ONE_DETECT and state is not None:
+        _check_n_plus_one(state, shape, params)
+
+
+def snapshot(limit: int = 20) -> dict:
+    """Top query shapes by total time, plus per-route totals"""
+    with _lock:
+        shapes = sorted(_shapes.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:limit]
+        queries = [
+            {
+                "query": shape,
+                "calls": stats["calls"],
+                "total_ms": round(stats["total_ms"], 2),
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 3),
+                "max_ms": round(stats["max_ms"], 2),
+                "rows": stats["rows"],
+                "routes": dict(sorted(stats["routes"].items(), key=lambda item: item[1], reverse=True)),
+            }
+            for shape, stats in shapes
+        ]
+        routes = {
+            route: {
+                "requests": stats["requests"],
+                "queries": stats["queries"],
+                "queries_per_request": round(stats["queries"] / stats["requests"], 2),
+                "max_queries": stats["max_queries"],
+                "db_ms_per_request": round(stats["total_ms"] / stats["requests"], 2),
+                "over_budget": stats["over_budget"],
+            }
+            for route, stats in sorted(_routes.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        }
+        n_plus_one = [
+            {"route": route, "query": shape, "detected": count}
+            for (route, shape), count in sorted(_n_plus_one.items(), key=lambda item: item[1], reverse=True)
+        ]
+    return {
+        "since": _since,
+        "slow_query_ms": DB_SLOW_QUERY_MS,
+        "query_budget": DB_QUERY_BUDGET,
+        "query_time_budget_ms": DB_QUERY_TIME_BUDGET_MS,
+        "queries": queries,
+        "routes": routes,
+        "n_plus_one": n_plus_one,
+    }
+
+
+def reset():
+    """Clear collected metrics"""
+    global _since
+    with _lock:
+        _shapes.clear()
+        _routes.clear()
+        _n_plus_one.clear()
+        _since = time.time()
+
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that records every statement it runs"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, time.perf_counter() - start, self.rowcount, vars)
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_query(sql, time.perf_counter() - start, self.rowcount)
+
+
+class InstrumentedAsyncConnection:
+    """asyncpg connection wrapper that records every statement it runs"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def fetch(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        rows = await self._conn.fetch(query, *args, **kwargs)
+        record_query(query, time.perf_counter() - start, len(rows), args)
+        return rows
+
+    async def fetchrow(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        row = await self._conn.fetchrow(query, *args, **kwargs)
+        record_query(query, time.perf_counter() - start, 1 if row is not None else 0, args)
+        return row
+
+    async def fetchval(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        value = await self._conn.fetchval(query, *args, **kwargs)
+        record_query(query, time.perf_counter() - start, 1, args)
+        return value
+
+    async def execute(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        status = await self._conn.execute(query, *args, **kwargs)
+        count = status.split()[-1] if status else ""
+        record_query(query, time.perf_counter() - start, int(count) if count.isdigit() else -1, args)
+        return status
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
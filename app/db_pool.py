@@ -0,0 +1,284 @@
+"""
+PostgreSQL connection pool for the database layer
+
+Connections are handed out by get_db_connection() in app.models. Calling
+close() on a pooled connection returns it to the pool instead of closing the
+socket, so existing callers that follow the connect/close pattern reuse
+connections without changes.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+from app.db_metrics import InstrumentedCursor
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))  # recycle connections idle longer than this
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))  # recycle connections older than this
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))  # ping idle connections older than this
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available before the checkout timeout"""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that goes back to its pool when closed"""
+
+    def cursor(self, *args, **kwargs):
+        # Callers asking for a plain RealDictCursor still get the instrumented one
+        if kwargs.get("cursor_factory") is RealDictCursor:
+            kwargs["cursor_factory"] = InstrumentedCursor
+        return super().cursor(*args, **kwargs)
+
+    def close(self):
+        pool = getattr(self, "_pool", None)
+        if pool is None:
+            return super().close()
+        if getattr(self, "_checked_out", False):
+            pool.putconn(self)
+
+    def discard(self):
+        """Really close the underlying socket"""
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe, blocking connection pool with health checks and metrics"""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        max_idle: float = DB_POOL_MAX_IDLE,
+        max_lifetime: float = DB_POOL_MAX_LIFETIME,
+        health_check_interval: float = DB_POOL_HEALTH_CHECK_INTERVAL,
+    ):
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # oldest released on the left, most recent on the right
+        self._size = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+        # Metrics
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+
+    def _connect(self) -> PooledConnection:
+        conn = psycopg2.connect(
+            self.dsn,
+            connection_factory=PooledConnection,
+            cursor_factory=InstrumentedCursor,
+        )
+        now = time.monotonic()
+        conn._pool = self
+        conn._checked_out = False
+        conn._created_at = now
+        conn._released_at = now
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _discard(self, conn: PooledConnection):
+        try:
+            conn.discard()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _expired(self, conn: PooledConnection, now: float) -> bool:
+        return self.max_lifetime > 0 and now - conn._created_at > self.max_lifetime
+
+    def _prune_idle_locked(self, now: float):
+        """Close connections that sat idle too long, keeping min_size around"""
+        if self.max_idle <= 0:
+            return
+        while self._idle and self._size > self.min_size and now - self._idle[0]._released_at > self.max_idle:
+            conn = self._idle.popleft()
+            try:
+                conn.discard()
+            except Exception:
+                pass
+            self._size -= 1
+            self._discarded += 1
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        """Check a connection before handing it out"""
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if self._expired(conn, now):
+            return False
+        if now - conn._released_at < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)  # not recorded in db_metrics
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            with self._cond:
+                self._health_check_failures += 1
+            return False
+
+    def getconn(self) -> PooledConnection:
+        """Check out a connection, waiting up to `timeout` seconds for one to free up"""
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                now = time.monotonic()
+                self._prune_idle_locked(now)
+                if self._idle:
+                    conn = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                else:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+                    continue
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(conn):
+                self._discard(conn)
+                continue
+
+            waited = time.perf_counter() - start
+            with self._cond:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            conn._checked_out = True
+            return conn
+
+    def putconn(self, conn: PooledConnection):
+        """Return a connection to the pool, rolling back any open transaction"""
+        conn._checked_out = False
+        if conn.closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+        except Exception:
+            self._discard(conn)
+            return
+
+        now = time.monotonic()
+        if self._expired(conn, now):
+            self._discard(conn)
+            return
+
+        conn._released_at = now
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def warm(self):
+        """Open connections up to min_size so the first requests skip the handshake"""
+        conns = []
+        try:
+            with self._cond:
+                missing = self.min_size - self._size
+            for _ in range(max(0, missing)):
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+
+    def closeall(self):
+        """Close all idle connections (checked-out ones close when returned)"""
+        with self._cond:
+            while self._idle:
+                conn = self._idle.popleft()
+                try:
+                    conn.discard()
+                except Exception:
+                    pass
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Pool metrics for monitoring"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "checkouts": self._checkouts,
+                "wait_time_total_ms": round(self._wait_total * 1000, 2),
+                "wait_time_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_time_max_ms": round(self._wait_max * 1000, 2),
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_discarded": self._discarded,
+                "health_check_failures": self._health_check_failures,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use (and after fork)"""
+    global _pool
+    pool = _pool
+    if pool is not None and pool._pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool._pid != os.getpid():
+            _pool = ConnectionPool(DATABASE_URL)
+        return _pool
@@ -0,0 +1,114 @@
+"""
+Conditional GET for the polled catalog endpoints
+
+The mini app and both bots poll /api/tasks, /api/rewards and
+/api/leaderboard although their content rarely changes. cached_json()
+answers those routes from a serialized body kept in the shared cache
+backend (app.cache_backend), keyed by the resource's version:
+
+- each resource (tasks, rewards, leaderboard, leaderboard:period) has a
+  version token, bumped by bump_resource() whenever a write changes it;
+- the first request after a bump loads and serializes the rows once, and
+  the body is stored with a strong ETag derived from its bytes;
+- later requests under the same version skip the database and the
+  serialization, and return 304 Not Modified when If-None-Match matches.
+
+Because the ETag hashes the body rather than the version, a bump that does
+not change the output (e.g. points earned outside the top-N) still lets
+clients revalidate with a 304.
+
+Versions are bumped by the admin endpoints, reward redemptions, point
+awards (after commit), the points rollup, and NOTIFY task_catalog
+(database/migrations/011_task_catalog_notify.sql). Changes made elsewhere
+show up within HTTP_CACHE_TTL_SECONDS. Clients may reuse a response for
+HTTP_CACHE_MAX_AGE_SECONDS before revalidating.
+"""
+import hashlib
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.cache_backend import get_backend
+from app.db_listener import subscribe
+from app.task_catalog import TASK_CATALOG_CHANNEL
+
+load_dotenv()
+
+HTTP_CACHE_TTL_SECONDS = float(os.getenv("HTTP_CACHE_TTL_SECONDS", "60"))  # 0 disables body caching
+HTTP_CACHE_MAX_AGE_SECONDS = int(os.getenv("HTTP_CACHE_MAX_AGE_SECONDS", "15"))
+
+VERSION_PREFIX = "http:version:"
+BODY_PREFIX = "http:body:"
+
+_adapters = {}
+
+
+def resource_version(resource: str) -> str:
+    return get_backend().version(f"{VERSION_PREFIX}{resource}")
+
+
+def bump_resource(*resources: str):
+    """Mark resources as changed: their cached bodies are no longer served"""
+    backend = get_backend()
+    for resource in resources:
+        backend.bump_version(f"{VERSION_PREFIX}{resource}")
+
+
+def _serialize(data: Any, response_model=None) -> bytes:
+    # Returning a Response bypasses FastAPI's response_model filtering, so
+    # apply the model here the same way FastAPI would
+    if response_model is not None:
+        adapter = _adapters.get(response_model)
+        if adapter is None:
+            adapter = _adapters[response_model] = TypeAdapter(response_model)
+        content = adapter.dump_python(adapter.validate_python(data), mode="json")
+    else:
+        content = jsonable_encoder(data)
+    return JSONResponse(content).body
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def cached_json(request: Request, resource: str, variant: str,
+                      load: Callable[[], Awaitable[Any]], response_model=None,
+                      max_age: int = HTTP_CACHE_MAX_AGE_SECONDS) -> Response:
+    """JSON response for resource, served from cache and honouring If-None-Match
+
+    variant identifies the query (parameters) within the resource.
+    """
+    backend = get_backend()
+    # Version fixed before loading: a bump meanwhile orphans this entry
+    key = f"{BODY_PREFIX}{resource}:{resource_version(resource)}:{variant}"
+    entry = backend.get(key) if HTTP_CACHE_TTL_SECONDS > 0 else None
+    if entry is None:
+        body = _serialize(await load(), response_model)
+        entry = (_etag(body), body)
+        if HTTP_CACHE_TTL_SECONDS > 0:
+            backend.set(key, entry, HTTP_CACHE_TTL_SECONDS)
+    etag, body = entry
+
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Task edits from other workers, the bot or manual SQL
+subscribe(TASK_CATALOG_CHANNEL, lambda payload: bump_resource("tasks"))
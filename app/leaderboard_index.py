@@ -0,0 +1,194 @@
+"""
+In-memory ranked leaderboard index
+
+Keeps every active, non-banned user in a sorted structure keyed by
+(points DESC, created_at ASC, id) - the same order as LEADERBOARD_SQL - so
+a user's exact rank and "users around me" windows are O(log n) lookups
+instead of counting over the users table.
+
+The index is process-local. It is warmed on API startup, updated after
+every points change made through DatabaseService, and rebuilt every
+LEADERBOARD_INDEX_REFRESH_SECONDS to pick up changes made by other
+processes (bot, other API workers, manual SQL). With
+LEADERBOARD_INDEX_ENABLED=false it is never built and ranks come from SQL.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from sortedcontainers import SortedList
+
+LEADERBOARD_INDEX_ENABLED = os.getenv("LEADERBOARD_INDEX_ENABLED", "true").lower() == "true"
+LEADERBOARD_INDEX_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_INDEX_REFRESH_SECONDS", "300"))
+
+_PROFILE_COLUMNS = "id, telegram_id, username, first_name, points, created_at"
+
+
+def _created_key(created_at) -> float:
+    if isinstance(created_at, datetime):
+        return created_at.timestamp()
+    if isinstance(created_at, str):
+        try:
+            return datetime.fromisoformat(created_at).timestamp()
+        except ValueError:
+            pass
+    return float("inf")
+
+
+class LeaderboardIndex:
+    """Thread-safe ranked index of user points"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._warm_lock = threading.Lock()  # one rebuild at a time
+        self._ranking = SortedList()  # (-points, created_at, user_id)
+        self._keys = {}  # user_id -> ranking key
+        self._profiles = {}  # user_id -> {"telegram_id", "username", "first_name"}
+        self._telegram_ids = {}  # telegram_id -> user_id
+        self._rebuilding = False
+        self._pending = []  # changes made while a rebuild was running
+        self.ready = False
+
+    def __len__(self):
+        return len(self._ranking)
+
+    # Building
+
+    def warm(self):
+        """(Re)build the index from the users table"""
+        with self._warm_lock:
+            self._warm()
+
+    def ensure_ready(self):
+        """Build the index unless it has been built already (waits for a running build)"""
+        if self.ready:
+            return
+        with self._warm_lock:
+            if not self.ready:
+                self._warm()
+
+    def _warm(self):
+        from app.models import supabase
+
+        with self._lock:
+            self._rebuilding = True
+            self._pending = []
+        try:
+            ranking, keys, profiles, telegram_ids = [], {}, {}, {}
+            rows = supabase.table("users").select(_PROFILE_COLUMNS)\
+                .eq("is_active", True)\
+                .eq("is_banned", False)\
+                .execute_stream(batch_size=5000)
+            for row in rows:
+                key = (-(row["points"] or 0), _created_key(row["created_at"]), row["id"])
+                ranking.append(key)
+                keys[row["id"]] = key
+                profiles[row["id"]] = {
+                    "telegram_id": row["telegram_id"],
+                    "username": row["username"],
+                    "first_name": row["first_name"],
+                }
+                telegram_ids[row["telegram_id"]] = row["id"]
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+                self._pending = []
+            raise
+
+        with self._lock:
+            self._ranking = SortedList(ranking)
+            self._keys = keys
+            self._profiles = profiles
+            self._telegram_ids = telegram_ids
+            self._rebuilding = False
+            pending, self._pending = self._pending, []
+            for method, args in pending:
+                method(*args)
+            self.ready = True
+
+    # Updates
+
+    def upsert(self, user: dict):
+        """Add or refresh a user from a users row (removed if inactive or banned)"""
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((self.upsert, (dict(user),)))
+            if not user.get("is_active", True) or user.get("is_banned", False):
+                self._remove(user["id"])
+                return
+            self._remove(user["id"])
+            key = (-(user.get("points") or 0), _created_key(user.get("created_at")), user["id"])
+            self._ranking.add(key)
+            self._keys[user["id"]] = key
+            self._profiles[user["id"]] = {
+                "telegram_id": user.get("telegram_id"),
+                "username": user.get("username"),
+                "first_name": user.get("first_name"),
+            }
+            if user.get("telegram_id") is not None:
+                self._telegram_ids[user["telegram_id"]] = user["id"]
+
+    def set_points(self, user_id: str, points: int):
+        """Move a ranked user to their new balance (unknown users wait for the next refresh)"""
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((self.set_points, (user_id, points)))
+            key = self._keys.get(user_id)
+            if key is None:
+                return
+            new_key = (-(points or 0), key[1], user_id)
+            self._ranking.remove(key)
+            self._ranking.add(new_key)
+            self._keys[user_id] = new_key
+
+    def remove(self, user_id: str):
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((self.remove, (user_id,)))
+            self._remove(user_id)
+
+    def _remove(self, user_id: str):
+        key = self._keys.pop(user_id, None)
+        if key is not None:
+            self._ranking.remove(key)
+        profile = self._profiles.pop(user_id, None)
+        if profile and self._telegram_ids.get(profile["telegram_id"]) == user_id:
+            del self._telegram_ids[profile["telegram_id"]]
+
+    # Queries
+
+    def _entry(self, position: int) -> dict:
+        neg_points, _, user_id = self._ranking[position]
+        return {"rank": position + 1, "user_id": user_id, "points": -neg_points, **self._profiles[user_id]}
+
+    def user_id_for(self, telegram_id: int) -> Optional[str]:
+        return self._telegram_ids.get(telegram_id)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based rank, or None if the user is not ranked"""
+        with self._lock:
+            key = self._keys.get(user_id)
+            return self._ranking.index(key) + 1 if key is not None else None
+
+    def around(self, user_id: str, radius: int = 5) -> List[dict]:
+        """The user plus up to `radius` users ranked directly above and below"""
+        with self._lock:
+            key = self._keys.get(user_id)
+            if key is None:
+                return []
+            position = self._ranking.index(key)
+            start = max(0, position - radius)
+            end = min(len(self._ranking), position + radius + 1)
+            return [self._entry(index) for index in range(start, end)]
+
+
+leaderboard_index = LeaderboardIndex()
+
+
+def record_points(user_id: str, points: Optional[int]):
+    """Apply a new balance to the index once the surrounding transaction commits"""
+    if not LEADERBOARD_INDEX_ENABLED or points is None:
+        return
+    from app.models import on_commit
+    on_commit(lambda: leaderboard_index.set_points(user_id, points))
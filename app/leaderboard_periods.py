@@ -0,0 +1,87 @@
+"""
+Weekly, monthly and season leaderboards
+
+Period standings are read from the user_points_daily rollup
+(database/migrations/010_points_daily.sql), which a background job in the
+API refreshes from the points_transactions ledger every
+POINTS_ROLLUP_INTERVAL_SECONDS. Because the rollup only changes on refresh,
+the top-N of each period is cached in the shared cache backend until the
+next refresh (or LEADERBOARD_PERIOD_CACHE_SECONDS, whichever comes first).
+
+Periods use UTC days: a week starts on Monday, a month on the 1st, and a
+season runs from LEADERBOARD_SEASON_START to LEADERBOARD_SEASON_END
+(exclusive; open-ended when unset).
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from app.cache_backend import CacheBackend, get_backend
+
+POINTS_ROLLUP_INTERVAL_SECONDS = float(os.getenv("POINTS_ROLLUP_INTERVAL_SECONDS", "60"))
+POINTS_ROLLUP_LAG_SECONDS = int(os.getenv("POINTS_ROLLUP_LAG_SECONDS", "300"))
+LEADERBOARD_PERIOD_CACHE_SECONDS = float(os.getenv("LEADERBOARD_PERIOD_CACHE_SECONDS", "60"))
+LEADERBOARD_SEASON_START = os.getenv("LEADERBOARD_SEASON_START")  # YYYY-MM-DD
+LEADERBOARD_SEASON_END = os.getenv("LEADERBOARD_SEASON_END")  # YYYY-MM-DD, exclusive
+
+PERIODS = ("week", "month", "season")
+
+
+def period_bounds(period: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """[start, end) of the current week, month or season
+
+    Raises ValueError for an unknown period or when no season is configured.
+    """
+    today = today or datetime.utcnow().date()
+    if period == "week":
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=7)
+    if period == "month":
+        start = today.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+        return start, end
+    if period == "season":
+        if not LEADERBOARD_SEASON_START:
+            raise ValueError("No season configured (LEADERBOARD_SEASON_START)")
+        start = date.fromisoformat(LEADERBOARD_SEASON_START)
+        end = date.fromisoformat(LEADERBOARD_SEASON_END) if LEADERBOARD_SEASON_END else today + timedelta(days=1)
+        return start, end
+    raise ValueError(f"Unknown leaderboard period: {period}")
+
+
+class PeriodLeaderboardCache:
+    """Top-N rows per (period, start, end, limit), dropped on every rollup refresh
+
+    Stored in the shared cache backend, so with CACHE_BACKEND=redis one
+    worker's load serves every worker until the next refresh.
+    """
+
+    PREFIX = "leaderboard:period:"
+    VERSION_KEY = "leaderboard:period:version"
+
+    def __init__(self, ttl: float = LEADERBOARD_PERIOD_CACHE_SECONDS, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self._backend = backend
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_backend()
+
+    def _key(self, key) -> str:
+        period, start, end, limit = key
+        return f"{self.PREFIX}{self.backend.version(self.VERSION_KEY)}:{period}:{start}:{end}:{limit}"
+
+    def clear(self):
+        self.backend.bump_version(self.VERSION_KEY)
+
+    async def get_or_load(self, key, load: Callable) -> List[dict]:
+        # Key (and version) fixed before loading: a refresh meanwhile orphans this entry
+        cache_key = self._key(key)
+        rows = self.backend.get(cache_key)
+        if rows is None:
+            rows = await load()
+            self.backend.set(cache_key, rows, self.ttl)
+        return rows
+
+
+period_leaderboard_cache = PeriodLeaderboardCache()
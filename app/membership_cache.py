@@ -0,0 +1,121 @@
+"""
+Short-lived cache of Telegram getChatMember results
+
+Users press "Verify" on join quests over and over, and every press used to
+be a getChatMember round trip - from /api/verify and from the bots. Results
+are cached per (chat_id, user_id) in the shared cache backend
+(app.cache_backend), so with CACHE_BACKEND=redis the API and both bots
+share them and a burst of retries costs one Bot API call:
+
+- members (creator, administrator, member, restricted) are kept for
+  TELEGRAM_MEMBER_CACHE_SECONDS - leaving right after verifying is rare;
+- anything else (left, kicked) is kept only TELEGRAM_NON_MEMBER_CACHE_SECONDS,
+  so a user who just joined is recognised on the next press;
+- failed calls are not cached.
+
+Entries are the Bot API's ChatMember object as a plain JSON dict
+({"status": ..., "user": {...}}) - never python-telegram-bot objects, since
+the API image doesn't install it; each caller applies its own rule for
+which statuses count. Entries are keyed by numeric chat id, so a bot
+checking "@channel" and the API checking -100... share them.
+"""
+import json
+import logging
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.cache_backend import CacheBackend, get_backend
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MEMBER_CACHE_SECONDS = float(os.getenv("TELEGRAM_MEMBER_CACHE_SECONDS", "300"))
+TELEGRAM_NON_MEMBER_CACHE_SECONDS = float(os.getenv("TELEGRAM_NON_MEMBER_CACHE_SECONDS", "5"))
+TELEGRAM_CHAT_ID_CACHE_SECONDS = float(os.getenv("TELEGRAM_CHAT_ID_CACHE_SECONDS", "86400"))
+
+MEMBER_STATUSES = ("creator", "administrator", "member", "restricted")
+
+
+class MembershipCache:
+    """(chat_id, user_id) -> ChatMember dict"""
+
+    PREFIX = "tg:member:"
+    CHAT_PREFIX = "tg:chat:"
+
+    def __init__(self, member_ttl: float = TELEGRAM_MEMBER_CACHE_SECONDS,
+                 non_member_ttl: float = TELEGRAM_NON_MEMBER_CACHE_SECONDS,
+                 backend: Optional[CacheBackend] = None):
+        self.member_ttl = member_ttl
+        self.non_member_ttl = non_member_ttl
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_backend()
+
+    # Quests name a chat either by numeric id (the API) or by @username (the
+    # bots). Entries are keyed by the numeric id so both find each other's:
+    # @usernames resolve through a mapping learnt with getChat.
+
+    def canonical_chat_id(self, chat_id) -> str:
+        """Numeric chat id as a string; an @username not resolved yet stays as is (lowercased)"""
+        chat_id = str(chat_id).strip()
+        if not chat_id.startswith("@"):
+            return chat_id
+        resolved = self.backend.get(f"{self.CHAT_PREFIX}{chat_id.lower()}")
+        return str(resolved) if resolved is not None else chat_id.lower()
+
+    def needs_resolving(self, chat_id) -> bool:
+        return self.canonical_chat_id(chat_id).startswith("@")
+
+    def remember_chat_id(self, username: str, numeric_id):
+        self.backend.set(f"{self.CHAT_PREFIX}{username.strip().lower()}", str(numeric_id),
+                         TELEGRAM_CHAT_ID_CACHE_SECONDS)
+
+    def _key(self, chat_id, user_id) -> str:
+        return f"{self.PREFIX}{self.canonical_chat_id(chat_id)}:{int(user_id)}"
+
+    def get(self, chat_id, user_id) -> Optional[dict]:
+        member = self.backend.get(self._key(chat_id, user_id))
+        if member is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(member)
+
+    def put(self, chat_id, user_id, member: dict):
+        # Plain values only: the entry is read by processes without python-telegram-bot
+        member = {**member, "status": str(member.get("status"))}
+        ttl = self.member_ttl if member["status"] in MEMBER_STATUSES else self.non_member_ttl
+        if ttl > 0:
+            self.backend.set(self._key(chat_id, user_id), member, ttl)
+
+    def evict(self, chat_id, user_id):
+        self.backend.delete(self._key(chat_id, user_id))
+
+    async def get_chat_member(self, bot, chat_id, user_id) -> dict:
+        """Cached bot.get_chat_member (python-telegram-bot), as a plain dict"""
+        if self.needs_resolving(chat_id):
+            try:
+                chat = await bot.get_chat(chat_id=chat_id)
+                self.remember_chat_id(str(chat_id), chat.id)
+            except Exception as exc:
+                # Still cached, under the @username, for this kind of caller
+                logger.warning("Could not resolve %s to a chat id: %s", chat_id, exc)
+        member = self.get(chat_id, user_id)
+        if member is None:
+            chat_member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+            member = json.loads(chat_member.to_json())
+            self.put(chat_id, user_id, member)
+        return member
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+membership_cache = MembershipCache()
@@ -2,21 +2,107 @@
 Database models and Supabase client configuration
 """
 import os
-from datetime import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from app.db_pool import get_pool
+from app.leaderboard_index import record_points, LEADERBOARD_INDEX_ENABLED
+from app.task_catalog import task_catalog
+from app.cache import user_cache, evict_user
+from app.http_cache import bump_resource
 
 load_dotenv()
 
 # Database connection using PostgreSQL directly (avoiding Supabase client issues)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection of the transaction() block running in this context, if any
+_current_transaction = ContextVar("db_transaction", default=None)
+# Callbacks registered with on_commit() inside that block
+_after_commit = ContextVar("db_after_commit", default=None)
+
+
+class _TransactionConnection:
+    """Hands out the transaction's connection; commit()/close() are left to transaction()"""
+    
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def commit(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
 def get_db_connection():
-    """Get a direct PostgreSQL connection"""
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    """Get a pooled PostgreSQL connection (close() returns it to the pool)
+    
+    Inside a supabase.transaction() block this is the transaction's
+    connection, so every builder query and DatabaseService call joins it.
+    """
+    conn = _current_transaction.get()
+    if conn is not None:
+        return _TransactionConnection(conn)
+    return get_pool().getconn()
+
+
+def in_transaction() -> bool:
+    return _current_transaction.get() is not None
+
+
+def on_commit(callback):
+    """Run callback after the current transaction() commits (right away outside one)
+    
+    Used to keep in-process state such as the leaderboard index in step with
+    the database: a rolled-back transaction never runs its callbacks.
+    """
+    callbacks = _after_commit.get()
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+@contextmanager
+def transaction():
+    """Unit of work: one connection, one COMMIT (ROLLBACK if the block raises)
+    
+        with supabase.transaction() as tx:
+            reward = tx.table("rewards").select("*").eq("id", reward_id).for_update().execute()
+            ...
+    
+    Nested blocks join the outer transaction.
+    """
+    if in_transaction():
+        yield supabase
+        return
+    
+    conn = get_pool().getconn()
+    callbacks = []
+    token = _current_transaction.set(conn)
+    callbacks_token = _after_commit.set(callbacks)
+    try:
+        yield supabase
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _after_commit.reset(callbacks_token)
+        _current_transaction.reset(token)
+        conn.close()
+    
+    for callback in callbacks:
+        callback()
 
 # For backwards compatibility, create a simple supabase-like wrapper
 class SimpleSupabaseClient:
@@ -24,6 +110,67 @@ class SimpleSupabaseClient:
     
     def table(self, table_name: str):
         return SimpleTable(table_name)
+    
+    def rpc(self, function_name: str, params: Optional[dict] = None):
+        """Call a PostgreSQL function (like supabase.rpc)"""
+        return SimpleRpc(function_name, params or {})
+    
+    def transaction(self):
+        """Run several statements on one connection with one commit (see transaction())"""
+        return transaction()
+
+
+class SimpleRpc:
+    """Stored function call built by SimpleSupabaseClient.rpc()"""
+    
+    def __init__(self, function_name: str, params: dict):
+        self.function_name = function_name
+        self.params = params
+    
+    def _build(self):
+        args = ", ".join(f"{name} => %s" for name in self.params)
+        return f"SELECT * FROM {self.function_name}({args})", list(self.params.values())
+    
+    def execute(self):
+        query, params = self._build()
+        return QueryResult(execute_sql(query, params))
+    
+    async def execute_async(self):
+        query, params = self._build()
+        return QueryResult(await execute_sql_async(query, params))
+
+class QueryResult:
+    """Query result wrapper exposing `.data` (and `.count`) like the Supabase client"""
+    
+    def __init__(self, data, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+# Rows per multi-row INSERT statement (keeps parameter counts well below limits)
+BULK_INSERT_PAGE_SIZE = 500
+
+
+def _copy_text_value(value) -> str:
+    """Format a value for COPY ... FROM STDIN (text format)"""
+    import json
+    
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif hasattr(value, "isoformat"):
+        value = value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
 
 class SimpleTable:
     def __init__(self, table_name: str):
@@ -31,18 +178,102 @@ class SimpleTable:
         self._select_fields = "*"
         self._filters = []
         
-    def select(self, fields: str = "*"):
+    def select(self, fields: str = "*", count: Optional[str] = None):
+        """Choose columns; count="exact" also reports the matching row count in `.count`"""
         self._select_fields = fields
+        self._count_exact = count == "exact"
         return self
     
     def eq(self, column: str, value):
         self._filters.append((column, "=", value))
         return self
     
+    def neq(self, column: str, value):
+        self._filters.append((column, "<>", value))
+        return self
+    
+    def gt(self, column: str, value):
+        self._filters.append((column, ">", value))
+        return self
+    
+    def gte(self, column: str, value):
+        self._filters.append((column, ">=", value))
+        return self
+    
+    def lt(self, column: str, value):
+        self._filters.append((column, "<", value))
+        return self
+    
+    def lte(self, column: str, value):
+        self._filters.append((column, "<=", value))
+        return self
+    
+    def in_(self, column: str, values):
+        """column IN (values) - parameterized, uses the column's index"""
+        self._filters.append((column, "IN", list(values)))
+        return self
+    
+    def ilike(self, column: str, pattern: str):
+        self._filters.append((column, "ILIKE", pattern))
+        return self
+    
+    def ieq(self, column: str, value):
+        """Case-insensitive equality: lower(column) = lower(value)
+        
+        Indexed when a matching lower(column) index exists (see
+        database/migrations/006_username_lower_index.sql).
+        """
+        self._filters.append((column, "IEQ", value))
+        return self
+    
+    def is_null(self, column: str, is_null: bool = True):
+        self._filters.append((column, "IS NULL" if is_null else "IS NOT NULL", None))
+        return self
+    
+    # Aggregates - computed by PostgreSQL, only the scalar comes back.
+    # result.data == [{"count": n}] / [{"sum": n}] / [{"count_distinct": n}]
+    
+    def count(self):
+        """COUNT(*) of the filtered rows (also exposed as result.count)"""
+        self._aggregate = ("count", "COUNT(*)")
+        return self
+    
+    def sum(self, column: str):
+        """SUM(column) of the filtered rows (0 when no rows match)"""
+        self._aggregate = ("sum", f"COALESCE(SUM({column}), 0)::bigint")
+        return self
+    
+    def count_distinct(self, column: str):
+        """COUNT(DISTINCT column) of the filtered rows (also exposed as result.count)"""
+        self._aggregate = ("count_distinct", f"COUNT(DISTINCT {column})")
+        return self
+    
     def order(self, column: str, desc: bool = False):
-        """Add ORDER BY clause"""
-        self._order_column = column
-        self._order_desc = desc
+        """Add ORDER BY clause (call again to add tie-breaker columns)"""
+        if not hasattr(self, '_order_by'):
+            self._order_by = []
+        self._order_by.append((column, desc))
+        return self
+    
+    def after(self, columns, values, desc: bool = False):
+        """Keyset pagination: only rows that sort after `values` on `columns`
+        
+        Compiles to a row comparison, e.g. (created_at, id) > (%s, %s), which
+        an index on the same columns answers without scanning skipped rows.
+        Use with .order() on the same columns and direction, and always end
+        with a unique column (usually id) so pages never overlap.
+        """
+        if isinstance(columns, str):
+            columns, values = [columns], [values]
+        columns, values = list(columns), list(values)
+        if len(columns) != len(values):
+            raise ValueError("after() needs one value per column")
+        self._filters.append((columns, "<" if desc else ">", values))
+        return self
+    
+    def for_update(self, skip_locked: bool = False):
+        """Lock the selected rows until the surrounding transaction() commits"""
+        self._for_update = " FOR UPDATE SKIP LOCKED" if skip_locked else " FOR UPDATE"
         return self
     
     def limit(self, count: int):
@@ -56,168 +287,547 @@ class SimpleTable:
         self._limit = end - start + 1
         return self
     
-    def execute(self):
-        """Execute the query based on what operations were chained"""
-        # Check if this is an insert operation
-        if hasattr(self, '_insert_data'):
-            return self.execute_insert()
-        
-        # Check if this is an update or delete operation
-        if hasattr(self, '_update_data') or hasattr(self, '_delete'):
-            return self.execute_update()
-        
-        # Otherwise it's a select operation
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    def insert(self, data: dict):
+        """Store insert data and return self for method chaining"""
+        self._insert_data = data
+        return self
+    
+    def insert_many(self, rows: List[dict], returning: bool = False):
+        """Insert many rows with multi-row INSERT ... VALUES statements.
         
-        query = f"SELECT {self._select_fields} FROM {self.table_name}"
-        params = []
+        All rows must have the same keys. With returning=False (default) only
+        the inserted count is reported, in `result.count`.
+        """
+        rows = list(rows)
+        if rows:
+            columns = list(rows[0].keys())
+            for row in rows:
+                if list(row.keys()) != columns:
+                    raise ValueError("insert_many rows must all have the same columns in the same order")
+        self._insert_rows = rows
+        self._insert_returning = returning
+        return self
+    
+    def copy(self, rows: List[dict], columns: Optional[List[str]] = None):
+        """Bulk load rows with COPY ... FROM STDIN (fastest path for large loads).
         
-        if self._filters:
-            where_clauses = []
-            for col, op, val in self._filters:
+        Rows may be dicts (keyed by column) or sequences matching `columns`.
+        """
+        rows = list(rows)
+        if columns is None:
+            if not rows or not isinstance(rows[0], dict):
+                raise ValueError("copy needs explicit columns unless rows are dicts")
+            columns = list(rows[0].keys())
+        self._copy_rows = rows
+        self._copy_columns = list(columns)
+        return self
+    
+    def update(self, data: dict):
+        """Store update data and return self for method chaining"""
+        self._update_data = data
+        return self
+    
+    def delete(self):
+        """Store delete flag and return self for method chaining"""
+        self._delete = True
+        return self
+    
+    # Query building (shared by the sync and async executors)
+    
+    def _build_where(self, params: list) -> str:
+        """Build the WHERE clause, appending filter values to params"""
+        if not self._filters:
+            return ""
+        where_clauses = []
+        for col, op, val in self._filters:
+            if op in ("IS NULL", "IS NOT NULL"):
+                where_clauses.append(f"{col} {op}")
+                continue
+            if op == "IN":
+                # One placeholder per value so each is typed like the column
+                # (a text[] array would not compare against uuid columns)
+                if not val:
+                    where_clauses.append("FALSE")
+                    continue
+                where_clauses.append(f"{col} IN ({', '.join(['%s'] * len(val))})")
+                params.extend(val)
+                continue
+            if isinstance(col, list):
+                # Row comparison from after()
+                placeholders = ", ".join(["%s"] * len(val))
+                where_clauses.append(f"({', '.join(col)}) {op} ({placeholders})")
+                params.extend(val)
+                continue
+            if op == "IEQ":
+                where_clauses.append(f"lower({col}) = lower(%s)")
+            else:
                 where_clauses.append(f"{col} {op} %s")
-                params.append(val)
-            query += " WHERE " + " AND ".join(where_clauses)
+            params.append(val)
+        return " WHERE " + " AND ".join(where_clauses)
+    
+    def _build_select(self):
+        """Build SELECT query and params"""
+        params = []
+        query = f"SELECT {self._select_fields} FROM {self.table_name}"
+        query += self._build_where(params)
         
         # Add ORDER BY if specified
-        if hasattr(self, '_order_column'):
-            query += f" ORDER BY {self._order_column}"
-            if getattr(self, '_order_desc', False):
-                query += " DESC"
+        if hasattr(self, '_order_by'):
+            query += " ORDER BY " + ", ".join(
+                f"{column} DESC" if desc else column for column, desc in self._order_by
+            )
         
         # Add LIMIT if specified
         if hasattr(self, '_limit'):
-            query += f" LIMIT {self._limit}"
+            query += f" LIMIT {int(self._limit)}"
         
         # Add OFFSET if specified
         if hasattr(self, '_offset'):
-            query += f" OFFSET {self._offset}"
+            query += f" OFFSET {int(self._offset)}"
+        
+        query += getattr(self, '_for_update', "")
+        return query, params
+    
+    def _build_aggregate(self):
+        """Build an aggregate query (count/sum/count_distinct) and params"""
+        name, expression = self._aggregate
+        params = []
+        query = f"SELECT {expression} AS {name} FROM {self.table_name}"
+        query += self._build_where(params)
+        return query, params
+    
+    def _build_count(self):
+        """Build COUNT(*) for select(..., count="exact") - ignores limit/offset"""
+        params = []
+        query = f"SELECT COUNT(*) AS count FROM {self.table_name}"
+        query += self._build_where(params)
+        return query, params
+    
+    @staticmethod
+    def _aggregate_result(name: str, row) -> QueryResult:
+        value = row[name] if row else 0
+        count = value if name in ("count", "count_distinct") else None
+        return QueryResult([{name: value}], count=count)
+    
+    def _build_insert(self):
+        """Build INSERT ... RETURNING * query and params"""
+        columns = ", ".join(self._insert_data.keys())
+        placeholders = ", ".join(["%s"] * len(self._insert_data))
+        query = f"INSERT INTO {self.table_name} ({columns}) VALUES ({placeholders}) RETURNING *"
+        return query, list(self._insert_data.values())
+    
+    def _build_insert_many(self):
+        """Build one multi-row INSERT (query, params) per page of rows"""
+        columns = list(self._insert_rows[0].keys())
+        row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        returning = " RETURNING *" if self._insert_returning else ""
+        statements = []
+        for start in range(0, len(self._insert_rows), BULK_INSERT_PAGE_SIZE):
+            page = self._insert_rows[start:start + BULK_INSERT_PAGE_SIZE]
+            params = []
+            for row in page:
+                params.extend(row[col] for col in columns)
+            query = (
+                f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES "
+                + ", ".join([row_placeholder] * len(page))
+                + returning
+            )
+            statements.append((query, params))
+        return statements
+    
+    def _build_update(self):
+        """Build UPDATE ... RETURNING * or DELETE query and params"""
+        params = []
+        if hasattr(self, '_update_data'):
+            set_clauses = []
+            for col, val in self._update_data.items():
+                set_clauses.append(f"{col} = %s")
+                params.append(val)
+            query = f"UPDATE {self.table_name} SET {', '.join(set_clauses)}"
+            query += self._build_where(params)
+            query += " RETURNING *"
+        else:
+            query = f"DELETE FROM {self.table_name}"
+            query += self._build_where(params)
+        return query, params
+    
+    @staticmethod
+    def _adapt_params(params: list) -> list:
+        """Wrap dict values in Json so psycopg2 can store them in JSONB columns"""
+        from psycopg2.extras import Json
+        return [Json(val) if isinstance(val, dict) else val for val in params]
+    
+    # Synchronous execution (psycopg2 pool)
+    
+    def execute(self):
+        """Execute the query based on what operations were chained"""
+        # Check if this is an insert operation
+        if hasattr(self, '_insert_data'):
+            return self.execute_insert()
         
-        cursor.execute(query, params)
-        data = cursor.fetchall()
+        if hasattr(self, '_insert_rows'):
+            return self.execute_insert_many()
         
-        cursor.close()
-        conn.close()
+        if hasattr(self, '_copy_rows'):
+            return self.execute_copy()
         
-        class Result:
-            def __init__(self, data):
-                self.data = data
+        # Check if this is an update or delete operation
+        if hasattr(self, '_update_data') or hasattr(self, '_delete'):
+            return self.execute_update()
+        
+        if hasattr(self, '_aggregate'):
+            query, params = self._build_aggregate()
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                row = cursor.fetchone()
+                cursor.close()
+            finally:
+                conn.close()
+            return self._aggregate_result(self._aggregate[0], row)
+        
+        # Otherwise it's a select operation
+        query, params = self._build_select()
+        
+        count = None
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            data = cursor.fetchall()
+            if getattr(self, '_count_exact', False):
+                count_query, count_params = self._build_count()
+                cursor.execute(count_query, count_params)
+                count = cursor.fetchone()["count"]
+            cursor.close()
+        finally:
+            conn.close()
         
-        return Result(data)
+        return QueryResult(data, count=count)
     
-    def insert(self, data: dict):
-        """Store insert data and return self for method chaining"""
-        self._insert_data = data
-        return self
+    def execute_stream(self, batch_size: int = 1000):
+        """Yield the selected rows one at a time in constant memory
+        
+        Uses a named (server-side) cursor, so PostgreSQL sends `batch_size`
+        rows per round trip instead of the whole result set. The pooled
+        connection stays checked out until the generator is exhausted or
+        closed - iterate it fully or wrap it in contextlib.closing().
+        """
+        import uuid
+        
+        query, params = self._build_select()
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+            cursor.close()
+        finally:
+            conn.close()
     
     def execute_insert(self):
         """Execute the insert query"""
-        import json
-        from psycopg2.extras import Json, RealDictCursor
+        query, params = self._build_insert()
         
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query, self._adapt_params(params))
+            result = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
         
-        columns = ", ".join(self._insert_data.keys())
-        placeholders = ", ".join(["%s"] * len(self._insert_data))
-        query = f"INSERT INTO {self.table_name} ({columns}) VALUES ({placeholders}) RETURNING *"
+        return QueryResult([result] if result else [])  # Wrap in list to match Supabase API
+    
+    def execute_insert_many(self):
+        """Execute insert_many() in one transaction"""
+        if not self._insert_rows:
+            return QueryResult([], count=0)
         
-        # Convert dict values to PostgreSQL-compatible types
-        # JSONB columns need to be wrapped in psycopg2.extras.Json
-        values = []
-        for key, value in self._insert_data.items():
-            if isinstance(value, dict):
-                # Convert dict to JSON for JSONB columns (like verification_data)
-                values.append(Json(value))
-            else:
-                values.append(value)
+        data = []
+        count = 0
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            for query, params in self._build_insert_many():
+                cursor.execute(query, self._adapt_params(params))
+                count += cursor.rowcount
+                if self._insert_returning:
+                    data.extend(cursor.fetchall())
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
         
-        cursor.execute(query, values)
-        result = cursor.fetchone()
+        return QueryResult(data, count=count)
+    
+    def execute_copy(self):
+        """Execute copy() with COPY ... FROM STDIN"""
+        import io
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        buffer = io.StringIO()
+        for row in self._copy_rows:
+            values = [row.get(col) for col in self._copy_columns] if isinstance(row, dict) else list(row)
+            buffer.write("\t".join(_copy_text_value(val) for val in values))
+            buffer.write("\n")
+        buffer.seek(0)
         
-        class Result:
-            def __init__(self, data):
-                self.data = [data] if data else []  # Wrap in list to match Supabase API
+        query = f"COPY {self.table_name} ({', '.join(self._copy_columns)}) FROM STDIN"
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.copy_expert(query, buffer)
+            count = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
         
-        return Result(result)
-    
-    def update(self, data: dict):
-        """Store update data and return self for method chaining"""
-        self._update_data = data
-        return self
-    
-    def delete(self):
-        """Store delete flag and return self for method chaining"""
-        self._delete = True
-        return self
+        return QueryResult([], count=count)
     
     def execute_update(self):
         """Execute the update query"""
-        import json
-        from psycopg2.extras import Json
+        if not (hasattr(self, '_update_data') or hasattr(self, '_delete')):
+            # Just execute as select
+            return self.execute()
+        
+        query, params = self._build_update()
         
         conn = get_db_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, self._adapt_params(params))
+            if hasattr(self, '_update_data'):
+                result = cursor.fetchone()
+            else:
+                result = {"deleted": cursor.rowcount}
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
         
-        set_clauses = []
-        params = []
+        return QueryResult(result)
+    
+    # Asynchronous execution (asyncpg pool) - does not block the event loop
+    
+    async def execute_async(self):
+        """Async variant of execute() for use inside FastAPI routes"""
+        from app.db_async import acquire, to_asyncpg_query
+        
+        if in_transaction():
+            # asyncpg cannot join a psycopg2 transaction; run it there instead
+            import asyncio
+            return await asyncio.to_thread(self.execute)
+        
+        if hasattr(self, '_insert_data'):
+            query, params = self._build_insert()
+            async with acquire() as conn:
+                row = await conn.fetchrow(to_asyncpg_query(query), *params)
+            return QueryResult([dict(row)] if row else [])
+        
+        if hasattr(self, '_insert_rows'):
+            data = []
+            count = 0
+            if self._insert_rows:
+                async with acquire() as conn:
+                    async with conn.transaction():
+                        for query, params in self._build_insert_many():
+                            rows = await conn.fetch(to_asyncpg_query(query), *params)
+                            if self._insert_returning:
+                                data.extend(dict(row) for row in rows)
+                                count += len(rows)
+                            else:
+                                count += len(params) // len(self._insert_rows[0])
+            return QueryResult(data, count=count)
+        
+        if hasattr(self, '_copy_rows'):
+            # COPY runs on the psycopg2 pool in a worker thread
+            import asyncio
+            return await asyncio.to_thread(self.execute_copy)
         
         if hasattr(self, '_update_data'):
-            for col, val in self._update_data.items():
-                set_clauses.append(f"{col} = %s")
-                # Convert dict values to JSON for JSONB columns
-                if isinstance(val, dict):
-                    params.append(Json(val))
-                else:
-                    params.append(val)
-            
-            query = f"UPDATE {self.table_name} SET {', '.join(set_clauses)}"
-            
-            if self._filters:
-                where_clauses = []
-                for col, op, val in self._filters:
-                    where_clauses.append(f"{col} {op} %s")
-                    params.append(val)
-                query += " WHERE " + " AND ".join(where_clauses)
-            
-            query += " RETURNING *"
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-        elif hasattr(self, '_delete'):
-            query = f"DELETE FROM {self.table_name}"
-            
-            if self._filters:
-                where_clauses = []
-                for col, op, val in self._filters:
-                    where_clauses.append(f"{col} {op} %s")
-                    params.append(val)
-                query += " WHERE " + " AND ".join(where_clauses)
-            
-            cursor.execute(query, params)
-            result = {"deleted": cursor.rowcount}
-        else:
-            # Just execute as select
-            return self.execute()
+            query, params = self._build_update()
+            async with acquire() as conn:
+                row = await conn.fetchrow(to_asyncpg_query(query), *params)
+            return QueryResult(dict(row) if row else None)
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        if hasattr(self, '_delete'):
+            query, params = self._build_update()
+            async with acquire() as conn:
+                status = await conn.execute(to_asyncpg_query(query), *params)
+            return QueryResult({"deleted": int(status.split()[-1])})
         
-        class Result:
-            def __init__(self, data):
-                self.data = data
+        if hasattr(self, '_aggregate'):
+            query, params = self._build_aggregate()
+            async with acquire() as conn:
+                row = await conn.fetchrow(to_asyncpg_query(query), *params)
+            return self._aggregate_result(self._aggregate[0], row)
         
-        return Result(result)
+        query, params = self._build_select()
+        count = None
+        async with acquire() as conn:
+            rows = await conn.fetch(to_asyncpg_query(query), *params)
+            if getattr(self, '_count_exact', False):
+                count_query, count_params = self._build_count()
+                count = await conn.fetchval(to_asyncpg_query(count_query), *count_params)
+        return QueryResult([dict(row) for row in rows], count=count)
 
 # Initialize the simple client
 supabase = SimpleSupabaseClient()
 
 
+def execute_sql(query: str, params: Optional[list] = None, fetch: str = "all"):
+    """Run a raw SQL statement on a pooled connection and commit.
+    
+    fetch: "all" returns a list of rows, "one" returns the first row or None,
+    anything else returns the affected row count.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, SimpleTable._adapt_params(params or []))
+        if fetch == "all":
+            result = cursor.fetchall()
+        elif fetch == "one":
+            result = cursor.fetchone()
+        else:
+            result = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return result
+
+
+async def execute_sql_async(query: str, params: Optional[list] = None, fetch: str = "all"):
+    """Async variant of execute_sql (asyncpg pool)"""
+    from app.db_async import acquire, to_asyncpg_query
+    
+    if in_transaction():
+        import asyncio
+        return await asyncio.to_thread(execute_sql, query, params, fetch)
+    
+    async with acquire() as conn:
+        if fetch == "all":
+            rows = await conn.fetch(to_asyncpg_query(query), *(params or []))
+            return [dict(row) for row in rows]
+        if fetch == "one":
+            row = await conn.fetchrow(to_asyncpg_query(query), *(params or []))
+            return dict(row) if row else None
+        status = await conn.execute(to_asyncpg_query(query), *(params or []))
+        return int(status.split()[-1]) if status.split()[-1].isdigit() else 0
+
+
+# Adds `amount` to the balance and writes the ledger row in one statement.
+# The UPDATE row lock serializes concurrent awards for the same user, so
+# there is no read-modify-write window to lose updates in.
+AWARD_POINTS_SQL = """
+WITH updated AS (
+    UPDATE users
+    SET points = COALESCE(points, 0) + %s::int,
+        total_earned_points = COALESCE(total_earned_points, 0) + GREATEST(%s::int, 0)
+    WHERE id = %s::uuid
+    RETURNING id, points, total_earned_points
+), ledger AS (
+    INSERT INTO points_transactions (user_id, amount, transaction_type, reference_id, description)
+    SELECT id, %s::int, %s::text, %s::uuid, %s::text FROM updated
+)
+SELECT points, total_earned_points FROM updated
+"""
+
+
+def _award_points_params(user_id: str, amount: int, transaction_type: str,
+                         reference_id: Optional[str], description: Optional[str]) -> list:
+    return [amount, amount, user_id, amount, transaction_type, reference_id, description]
+
+
+def _points_changed(user_id: str, points: int):
+    """Bring the leaderboard index and user cache in line with a new balance after commit"""
+    record_points(user_id, points)
+    evict_user(user_id)
+    on_commit(lambda: bump_resource("leaderboard"))
+
+
+LEADERBOARD_MAX_LIMIT = 1000
+
+# Top-N users with their completed-task counts in one statement. The inner
+# query walks idx_users_leaderboard (database/migrations/008_leaderboard.sql)
+# and stops after `limit` rows; completed_tasks is the trigger-maintained
+# users.completed_tasks_count (database/migrations/009_completion_counters.sql),
+# so no user_tasks rows are read at all.
+LEADERBOARD_SQL = """
+SELECT u.*, u.completed_tasks_count AS completed_tasks
+FROM (
+    SELECT * FROM users
+    WHERE is_active = TRUE AND is_banned = FALSE
+    ORDER BY points DESC, created_at ASC, id ASC
+    LIMIT %s
+) u
+ORDER BY u.points DESC, u.created_at ASC, u.id ASC
+"""
+
+# A user's rank when the in-memory index (app/leaderboard_index.py) is
+# disabled: counts the ranked users ahead of them in LEADERBOARD_SQL order.
+# rank is NULL for banned or inactive users.
+USER_RANK_SQL = """
+SELECT me.id AS user_id, me.telegram_id, me.username, me.first_name, me.points,
+    CASE WHEN me.is_active AND NOT me.is_banned THEN (
+        SELECT COUNT(*) + 1 FROM users u
+        WHERE u.is_active = TRUE AND u.is_banned = FALSE
+          AND (u.points > me.points
+               OR (u.points = me.points AND (u.created_at, u.id) < (me.created_at, me.id)))
+    ) END AS rank,
+    (SELECT COUNT(*) FROM users WHERE is_active = TRUE AND is_banned = FALSE) AS total_ranked
+FROM users me
+WHERE me.telegram_id = %s
+"""
+
+# Up to `radius` ranked users directly above and directly below a user,
+# walked from the user's position along idx_users_leaderboard
+USER_NEIGHBOURS_SQL = """
+(SELECT 'above' AS side, u.id AS user_id, u.telegram_id, u.username, u.first_name, u.points
+ FROM users u, users me
+ WHERE me.id = %s AND u.is_active = TRUE AND u.is_banned = FALSE
+   AND (u.points > me.points
+        OR (u.points = me.points AND (u.created_at, u.id) < (me.created_at, me.id)))
+ ORDER BY u.points ASC, u.created_at DESC, u.id DESC
+ LIMIT %s)
+UNION ALL
+(SELECT 'below' AS side, u.id AS user_id, u.telegram_id, u.username, u.first_name, u.points
+ FROM users u, users me
+ WHERE me.id = %s AND u.is_active = TRUE AND u.is_banned = FALSE
+   AND (u.points < me.points
+        OR (u.points = me.points AND (u.created_at, u.id) > (me.created_at, me.id)))
+ ORDER BY u.points DESC, u.created_at ASC, u.id ASC
+ LIMIT %s)
+"""
+
+# Top-N users by points earned in [start, end) from the daily rollup
+# (database/migrations/010_points_daily.sql). A month is at most ~31 rollup
+# rows per user, so this never touches the points_transactions ledger.
+PERIOD_LEADERBOARD_SQL = """
+SELECT u.*, u.completed_tasks_count AS completed_tasks, d.period_points
+FROM (
+    SELECT user_id, SUM(points)::bigint AS period_points
+    FROM user_points_daily
+    WHERE day >= %s AND day < %s
+    GROUP BY user_id
+) d
+JOIN users u ON u.id = d.user_id
+WHERE u.is_active = TRUE AND u.is_banned = FALSE AND d.period_points > 0
+ORDER BY d.period_points DESC, u.created_at ASC, u.id ASC
+LIMIT %s
+"""
+
+
 # Pydantic Models
 class User(BaseModel):
     id: Optional[str] = None
@@ -339,210 +949,416 @@ class DatabaseService:
     """Service class for database operations"""
     
     @staticmethod
-    def get_user_by_telegram_id(telegram_id: int) -> Optional[dict]:
-        """Get user by Telegram ID"""
+    def get_user_by_telegram_id(telegram_id: int, fresh: bool = False) -> Optional[dict]:
+        """Get user by Telegram ID (cached for a few seconds, see app.cache)
+        
+        Pass fresh=True when the exact current balance matters.
+        """
+        if not fresh:
+            user = user_cache.get_by_telegram_id(telegram_id)
+            if user is not None:
+                return user
+        generation = user_cache.generation()
         response = supabase.table("users").select("*").eq("telegram_id", telegram_id).execute()
+        user = response.data[0] if response.data else None
+        user_cache.put(user, generation)
+        return user
+    
+    @staticmethod
+    async def get_user_by_telegram_id_async(telegram_id: int, fresh: bool = False) -> Optional[dict]:
+        """Get user by Telegram ID without blocking the event loop"""
+        if not fresh:
+            user = user_cache.get_by_telegram_id(telegram_id)
+            if user is not None:
+                return user
+        generation = user_cache.generation()
+        response = await supabase.table("users").select("*").eq("telegram_id", int(telegram_id)).execute_async()
+        user = response.data[0] if response.data else None
+        user_cache.put(user, generation)
+        return user
+    
+    @staticmethod
+    async def get_user_by_username_async(username: str) -> Optional[dict]:
+        """Case-insensitive username lookup (indexed on lower(username)), exact case preferred"""
+        response = await supabase.table("users").select("*").ieq("username", username).execute_async()
+        for user in response.data:
+            if user.get("username") == username:
+                return user
         return response.data[0] if response.data else None
     
     @staticmethod
     def create_user(user_data: dict) -> dict:
         """Create a new user"""
         response = supabase.table("users").insert(user_data).execute()
-        return response.data[0] if response.data else None
+        user = response.data[0] if response.data else None
+        if user and LEADERBOARD_INDEX_ENABLED:
+            from app.leaderboard_index import leaderboard_index
+            on_commit(lambda: leaderboard_index.upsert(user))
+        return user
+    
+    @staticmethod
+    def award_points(user_id: str, amount: int, transaction_type: str = "earned",
+                     reference_id: Optional[str] = None, description: Optional[str] = None) -> Optional[dict]:
+        """Atomically add points to a user and write the ledger row (one round trip)"""
+        row = execute_sql(
+            AWARD_POINTS_SQL,
+            _award_points_params(user_id, amount, transaction_type, reference_id, description),
+            fetch="one",
+        )
+        if not row:
+            return None
+        _points_changed(user_id, row["points"])
+        return {
+            "points": row["points"],
+            "total_earned_points": row["total_earned_points"],
+            "awarded_points": amount
+        }
+    
+    @staticmethod
+    async def award_points_async(user_id: str, amount: int, transaction_type: str = "earned",
+                                 reference_id: Optional[str] = None, description: Optional[str] = None) -> Optional[dict]:
+        """Async variant of award_points"""
+        row = await execute_sql_async(
+            AWARD_POINTS_SQL,
+            _award_points_params(user_id, amount, transaction_type, reference_id, description),
+            fetch="one",
+        )
+        if not row:
+            return None
+        _points_changed(user_id, row["points"])
+        return {
+            "points": row["points"],
+            "total_earned_points": row["total_earned_points"],
+            "awarded_points": amount
+        }
     
     @staticmethod
     def update_user_points(user_id: str, points_change: int, transaction_type: str = "earned") -> dict:
         """Update user points and create transaction log"""
-        # Get current user
-        user_response = supabase.table("users").select("*").eq("id", user_id).execute()
-        if not user_response.data:
-            return None
-        
-        user = user_response.data[0]
-
         # Normalize numeric values to avoid type errors from Supabase responses
-        try:
-            current_points = int(user.get("points", 0) or 0)
-        except (TypeError, ValueError):
-            current_points = 0
-
         try:
             delta_points = int(points_change or 0)
         except (TypeError, ValueError):
             delta_points = 0
-
-        new_points = current_points + delta_points
         
-        # Update user points
-        update_data = {"points": new_points}
-        if delta_points > 0:
-            try:
-                total_earned = int(user.get("total_earned_points", 0) or 0)
-            except (TypeError, ValueError):
-                total_earned = 0
-            update_data["total_earned_points"] = total_earned + delta_points
-        
-        supabase.table("users").update(update_data).eq("id", user_id).execute()
-        
-        # Create transaction log
-        transaction_data = {
-            "user_id": user_id,
-            "amount": delta_points,
-            "transaction_type": transaction_type
+        return DatabaseService.award_points(user_id, delta_points, transaction_type)
+    
+    @staticmethod
+    def _completion_params(user_id: str, task_id: str, points: int, status: str,
+                           proof_url: Optional[str], notification_title: Optional[str],
+                           notification_message: Optional[str], notification_type: str,
+                           mark_verified: bool, repeatable: bool) -> dict:
+        return {
+            "p_user_id": user_id,
+            "p_task_id": task_id,
+            "p_points": int(points or 0),
+            "p_status": status,
+            "p_proof_url": proof_url,
+            "p_notification_title": notification_title,
+            "p_notification_message": notification_message,
+            "p_notification_type": notification_type,
+            "p_mark_verified": mark_verified,
+            "p_repeatable": repeatable,
         }
-        supabase.table("points_transactions").insert(transaction_data).execute()
-        
+    
+    @staticmethod
+    def _completion_result(rows: list) -> dict:
+        if not rows:
+            return {"awarded": False, "user_task_id": None, "points": None, "total_earned_points": None}
+        row = rows[0]
         return {
-            "points": new_points,
-            "total_earned_points": update_data.get("total_earned_points", user.get("total_earned_points", 0)),
-            "awarded_points": delta_points
+            "awarded": bool(row["awarded"]),
+            "user_task_id": row["user_task_id"],
+            "points": row["new_balance"],
+            "total_earned_points": row["new_total_earned"],
         }
     
+    @staticmethod
+    def award_completion(user_id: str, task_id: str, points: int, status: str = "completed",
+                         proof_url: Optional[str] = None, notification_title: Optional[str] = None,
+                         notification_message: Optional[str] = None, notification_type: str = "task_verified",
+                         mark_verified: bool = False, repeatable: bool = False) -> dict:
+        """Complete a quest in one round trip via the award_completion() SQL function.
+        
+        Marks the user_task completed, awards points, writes the ledger row and
+        (optionally) a notification. Returns {"awarded": False, ...} without
+        changing anything if the user already completed the task.
+        """
+        response = supabase.rpc("award_completion", DatabaseService._completion_params(
+            user_id, task_id, points, status, proof_url, notification_title,
+            notification_message, notification_type, mark_verified, repeatable
+        )).execute()
+        result = DatabaseService._completion_result(response.data)
+        if result["awarded"]:
+            _points_changed(user_id, result["points"])
+        return result
+    
+    @staticmethod
+    async def award_completion_async(user_id: str, task_id: str, points: int, status: str = "completed",
+                                     proof_url: Optional[str] = None, notification_title: Optional[str] = None,
+                                     notification_message: Optional[str] = None, notification_type: str = "task_verified",
+                                     mark_verified: bool = False, repeatable: bool = False) -> dict:
+        """Async variant of award_completion"""
+        response = await supabase.rpc("award_completion", DatabaseService._completion_params(
+            user_id, task_id, points, status, proof_url, notification_title,
+            notification_message, notification_type, mark_verified, repeatable
+        )).execute_async()
+        result = DatabaseService._completion_result(response.data)
+        if result["awarded"]:
+            _points_changed(user_id, result["points"])
+        return result
+    
     @staticmethod
     def get_active_tasks() -> List[dict]:
-        """Get all active tasks"""
-        response = supabase.table("tasks").select("*").eq("is_active", True).execute()
-        return response.data or []
+        """Get all active tasks (from the task catalog cache)"""
+        return task_catalog.active()
+    
+    @staticmethod
+    async def get_active_tasks_async() -> List[dict]:
+        """Get all active tasks without blocking the event loop"""
+        return await task_catalog.active_async()
     
     @staticmethod
     def get_task_by_id(task_id: str) -> Optional[dict]:
-        """Get task by ID"""
-        response = supabase.table("tasks").select("*").eq("id", task_id).execute()
-        return response.data[0] if response.data else None
+        """Get task by ID (from the task catalog cache)"""
+        return task_catalog.get(task_id)
+    
+    @staticmethod
+    async def get_task_by_id_async(task_id: str) -> Optional[dict]:
+        """Async variant of get_task_by_id"""
+        return await task_catalog.get_async(task_id)
     
     @staticmethod
     def complete_task(user_id: str, task_id: str, proof_url: Optional[str] = None) -> dict:
         """Mark task as completed for user"""
-        # Check if user_task exists
-        existing = supabase.table("user_tasks").select("*").eq("user_id", user_id).eq("task_id", task_id).execute()
-        
         task = DatabaseService.get_task_by_id(task_id)
         if not task:
             return {"error": "Task not found"}
         
+        if not task["verification_required"]:
+            # Complete and award in a single round trip
+            result = DatabaseService.award_completion(user_id, task_id, task["points_reward"], proof_url=proof_url)
+            if not result["awarded"]:
+                return {"error": "Task already completed"}
+            return {
+                "id": result["user_task_id"],
+                "user_id": user_id,
+                "task_id": task_id,
+                "status": "completed",
+                "points_earned": task["points_reward"],
+                "points": result["points"]
+            }
+        
+        # Needs review: record the submission without awarding points
+        existing = supabase.table("user_tasks").select("*").eq("user_id", user_id).eq("task_id", task_id).execute()
+        
         if existing.data:
             # Update existing
             update_data = {
-                "status": "completed" if not task["verification_required"] else "submitted",
-                "completion_count": existing.data[0]["completion_count"] + 1,
+                "status": "submitted",
+                "completion_count": (existing.data[0]["completion_count"] or 0) + 1,
                 "completed_at": datetime.utcnow().isoformat()
             }
             if proof_url:
                 update_data["proof_url"] = proof_url
             
-            if not task["verification_required"]:
-                update_data["points_earned"] = task["points_reward"]
-                DatabaseService.update_user_points(user_id, task["points_reward"], "earned")
-            
             response = supabase.table("user_tasks").update(update_data).eq("id", existing.data[0]["id"]).execute()
-        else:
-            # Create new
-            insert_data = {
-                "user_id": user_id,
-                "task_id": task_id,
-                "status": "completed" if not task["verification_required"] else "submitted",
-                "completion_count": 1,
-                "completed_at": datetime.utcnow().isoformat()
-            }
-            if proof_url:
-                insert_data["proof_url"] = proof_url
-            
-            if not task["verification_required"]:
-                insert_data["points_earned"] = task["points_reward"]
-                DatabaseService.update_user_points(user_id, task["points_reward"], "earned")
-            
-            response = supabase.table("user_tasks").insert(insert_data).execute()
+            return response.data
+        
+        # Create new
+        insert_data = {
+            "user_id": user_id,
+            "task_id": task_id,
+            "status": "submitted",
+            "completion_count": 1,
+            "completed_at": datetime.utcnow().isoformat()
+        }
+        if proof_url:
+            insert_data["proof_url"] = proof_url
         
+        response = supabase.table("user_tasks").insert(insert_data).execute()
         return response.data[0] if response.data else None
     
     @staticmethod
     def get_leaderboard(limit: int = 10) -> List[dict]:
-        """Get top users by points with completed tasks count - simplified approach"""
+        """Get top users by points with completed tasks count (one query)"""
+        limit = max(1, min(int(limit), LEADERBOARD_MAX_LIMIT))
         try:
-            # Get top users by points
-            response = supabase.table("users")\
-                .select("*")\
-                .eq("is_active", True)\
-                .eq("is_banned", False)\
-                .order("points", desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            users = response.data or []
-            
-            # Add completed tasks count for each user - simplified query
-            for user in users:
-                try:
-                    # Get all completed tasks for this user
-                    tasks = supabase.table("user_tasks")\
-                        .select("id")\
-                        .eq("user_id", user['id'])\
-                        .eq("status", "completed")\
-                        .execute()
-                    
-                    # Count manually from returned data
-                    user['completed_tasks'] = len(tasks.data) if tasks.data else 0
-                except Exception as e:
-                    print(f"Error counting tasks for user {user.get('id')}: {e}")
-                    user['completed_tasks'] = 0
-            
-            return users
-            
+            return execute_sql(LEADERBOARD_SQL, [limit])
         except Exception as e:
             print(f"Error getting leaderboard: {e}")
             return []
     
+    @staticmethod
+    async def get_leaderboard_async(limit: int = 10) -> List[dict]:
+        """Async variant of get_leaderboard"""
+        limit = max(1, min(int(limit), LEADERBOARD_MAX_LIMIT))
+        try:
+            return await execute_sql_async(LEADERBOARD_SQL, [limit])
+        except Exception as e:
+            print(f"Error getting leaderboard: {e}")
+            return []
+
+    @staticmethod
+    async def get_user_rank_async(telegram_id: int, around: int = 0) -> Optional[dict]:
+        """Rank from SQL, shaped like the leaderboard index's (None if the user doesn't exist)"""
+        me = await execute_sql_async(USER_RANK_SQL, [int(telegram_id)], fetch="one")
+        if not me:
+            return None
+        neighbours = []
+        if around and me["rank"]:
+            rows = await execute_sql_async(USER_NEIGHBOURS_SQL, [me["user_id"], around, me["user_id"], around])
+            above = [row for row in rows if row["side"] == "above"]
+            below = [row for row in rows if row["side"] == "below"]
+            for offset, row in reversed(list(enumerate(above, 1))):
+                neighbours.append({"rank": me["rank"] - offset, **row})
+            neighbours.append({"rank": me["rank"], **me})
+            for offset, row in enumerate(below, 1):
+                neighbours.append({"rank": me["rank"] + offset, **row})
+            for entry in neighbours:
+                entry.pop("side", None)
+                entry.pop("total_ranked", None)
+                entry["user_id"] = str(entry["user_id"])
+        return {
+            "telegram_id": telegram_id,
+            "rank": me["rank"],
+            "points": me["points"] if me["rank"] else None,
+            "total_ranked": me["total_ranked"],
+            "around": neighbours,
+        }
+
+    @staticmethod
+    def get_period_leaderboard(start: date, end: date, limit: int = 10) -> List[dict]:
+        """Top users by points earned between start (inclusive) and end (exclusive)"""
+        limit = max(1, min(int(limit), LEADERBOARD_MAX_LIMIT))
+        try:
+            return execute_sql(PERIOD_LEADERBOARD_SQL, [start, end, limit])
+        except Exception as e:
+            print(f"Error getting period leaderboard: {e}")
+            return []
+
+    @staticmethod
+    async def get_period_leaderboard_async(start: date, end: date, limit: int = 10) -> List[dict]:
+        """Async variant of get_period_leaderboard"""
+        limit = max(1, min(int(limit), LEADERBOARD_MAX_LIMIT))
+        try:
+            return await execute_sql_async(PERIOD_LEADERBOARD_SQL, [start, end, limit])
+        except Exception as e:
+            print(f"Error getting period leaderboard: {e}")
+            return []
+
+    @staticmethod
+    def refresh_points_rollup(lag_seconds: int = 300) -> Optional[dict]:
+        """Recompute recent days of user_points_daily; None if another worker is refreshing"""
+        rows = supabase.rpc("refresh_user_points_daily", {"p_lag_seconds": int(lag_seconds)}).execute().data
+        return rows[0] if rows else None
+
+    @staticmethod
+    async def refresh_points_rollup_async(lag_seconds: int = 300) -> Optional[dict]:
+        """Async variant of refresh_points_rollup"""
+        rows = (await supabase.rpc("refresh_user_points_daily", {"p_lag_seconds": int(lag_seconds)}).execute_async()).data
+        return rows[0] if rows else None
+
+    @staticmethod
+    def reconcile_completion_counters() -> dict:
+        """Repair drift in users.completed_tasks_count / tasks.completions_count"""
+        rows = supabase.rpc("reconcile_completion_counters").execute().data
+        return rows[0] if rows else {"users_fixed": 0, "tasks_fixed": 0}
+
+    @staticmethod
+    async def reconcile_completion_counters_async() -> dict:
+        """Async variant of reconcile_completion_counters"""
+        rows = (await supabase.rpc("reconcile_completion_counters").execute_async()).data
+        return rows[0] if rows else {"users_fixed": 0, "tasks_fixed": 0}
+
+    @staticmethod
+    def get_system_stats() -> dict:
+        """Admin totals from the trigger-maintained system_counters (one row)"""
+        return supabase.table("system_stats").select("*").execute().data[0]
+
+    @staticmethod
+    async def get_system_stats_async() -> dict:
+        """Async variant of get_system_stats"""
+        return (await supabase.table("system_stats").select("*").execute_async()).data[0]
+
+    @staticmethod
+    def reconcile_system_counters() -> dict:
+        """Repair drift in system_counters and prune old user_activity_daily rows"""
+        rows = supabase.rpc("reconcile_system_counters").execute().data
+        return rows[0] if rows else {"counters_fixed": 0}
+
+    @staticmethod
+    async def reconcile_system_counters_async() -> dict:
+        """Async variant of reconcile_system_counters"""
+        rows = (await supabase.rpc("reconcile_system_counters").execute_async()).data
+        return rows[0] if rows else {"counters_fixed": 0}
+
     @staticmethod
     def get_active_rewards() -> List[dict]:
         """Get all active rewards"""
         response = supabase.table("rewards").select("*").eq("is_active", True).execute()
         return response.data or []
     
+    @staticmethod
+    async def get_active_rewards_async() -> List[dict]:
+        """Get all active rewards without blocking the event loop"""
+        response = await supabase.table("rewards").select("*").eq("is_active", True).execute_async()
+        return response.data or []
+    
     @staticmethod
     def redeem_reward(user_id: str, reward_id: str) -> dict:
-        """Redeem a reward for user"""
-        # Get user
-        user_response = supabase.table("users").select("*").eq("id", user_id).execute()
-        if not user_response.data:
-            return {"error": "User not found"}
-        
-        user = user_response.data[0]
-        
-        # Get reward
-        reward_response = supabase.table("rewards").select("*").eq("id", reward_id).execute()
-        if not reward_response.data:
-            return {"error": "Reward not found"}
-        
-        reward = reward_response.data[0]
-        
-        # Check if user has enough points
-        if user["points"] < reward["points_cost"]:
-            return {"error": "Insufficient points"}
-        
-        # Check if reward is available
-        if reward["quantity_available"] and reward["quantity_claimed"] >= reward["quantity_available"]:
-            return {"error": "Reward not available"}
+        """Redeem a reward for user
         
-        # Deduct points
-        DatabaseService.update_user_points(user_id, -reward["points_cost"], "spent")
-        
-        # Generate redemption code
+        Runs as one transaction. The reward row is locked first and then the
+        user row, so concurrent redemptions queue up instead of overselling
+        stock or spending the same points twice.
+        """
         import random
         import string
-        code_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        redemption_code = f"{reward.get('code_prefix', 'REWARD')}-{code_suffix}"
-        
-        # Create user reward
-        user_reward_data = {
-            "user_id": user_id,
-            "reward_id": reward_id,
-            "redemption_code": redemption_code,
-            "status": "pending"
-        }
-        supabase.table("user_rewards").insert(user_reward_data).execute()
         
-        # Update reward claimed count
-        supabase.table("rewards").update({"quantity_claimed": reward["quantity_claimed"] + 1}).eq("id", reward_id).execute()
+        with supabase.transaction() as tx:
+            # Get reward (locked until commit)
+            reward_response = tx.table("rewards").select("*").eq("id", reward_id).for_update().execute()
+            if not reward_response.data:
+                return {"error": "Reward not found"}
+            
+            reward = reward_response.data[0]
+            
+            # Get user (locked until commit)
+            user_response = tx.table("users").select("*").eq("id", user_id).for_update().execute()
+            if not user_response.data:
+                return {"error": "User not found"}
+            
+            user = user_response.data[0]
+            
+            # Check if user has enough points
+            if (user["points"] or 0) < reward["points_cost"]:
+                return {"error": "Insufficient points"}
+            
+            # Check if reward is available
+            quantity_claimed = reward["quantity_claimed"] or 0
+            if reward["quantity_available"] and quantity_claimed >= reward["quantity_available"]:
+                return {"error": "Reward not available"}
+            
+            # Deduct points
+            DatabaseService.award_points(user_id, -reward["points_cost"], "spent", reference_id=reward_id)
+            
+            # Generate redemption code
+            code_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+            redemption_code = f"{reward.get('code_prefix') or 'REWARD'}-{code_suffix}"
+            
+            # Create user reward
+            user_reward_data = {
+                "user_id": user_id,
+                "reward_id": reward_id,
+                "redemption_code": redemption_code,
+                "status": "pending"
+            }
+            tx.table("user_rewards").insert(user_reward_data).execute()
+            
+            # Update reward claimed count
+            tx.table("rewards").update({"quantity_claimed": quantity_claimed + 1}).eq("id", reward_id).execute()
+            on_commit(lambda: bump_resource("rewards"))
         
         return {"success": True, "redemption_code": redemption_code}
     
@@ -559,10 +1375,32 @@ class DatabaseService:
         return response.data[0] if response.data else None
     
     @staticmethod
-    def get_user_notifications(user_id: str, unread_only: bool = False) -> List[dict]:
-        """Get user notifications"""
+    def notify_active_users(title: str, message: str, notification_type: str = "system") -> int:
+        """Create the same notification for every active user in one set-based INSERT"""
+        return execute_sql(
+            """
+            INSERT INTO notifications (user_id, title, message, notification_type)
+            SELECT id, %s, %s, %s FROM users WHERE is_active = TRUE
+            """,
+            [title, message, notification_type],
+            fetch=None,
+        )
+    
+    @staticmethod
+    def get_user_notifications(user_id: str, unread_only: bool = False,
+                               limit: Optional[int] = None, after: Optional[list] = None) -> List[dict]:
+        """Get user notifications, newest first
+        
+        `after` is the (created_at, id) of the last notification on the
+        previous page (keyset pagination).
+        """
         query = supabase.table("notifications").select("*").eq("user_id", user_id)
         if unread_only:
             query = query.eq("is_read", False)
-        response = query.order("created_at", desc=True).execute()
+        if after:
+            query = query.after(["created_at", "id"], after, desc=True)
+        query = query.order("created_at", desc=True).order("id", desc=True)
+        if limit:
+            query = query.limit(limit)
+        response = query.execute()
         return response.data or []
@@ -4,6 +4,7 @@ Handles Telegram group/channel membership verification
 """
 import logging
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from app.membership_cache import membership_cache
 
 logger = logging.getLogger(__name__)
 
@@ -170,14 +171,13 @@ class TelegramQuestHandler:
             return
         
         try:
-            # Check membership
-            chat_member = await self.bot.bot.get_chat_member(
-                chat_id=f"@{channel_username}",
-                user_id=user.id
+            # Check membership (cached briefly across bots and API)
+            chat_member = await membership_cache.get_chat_member(
+                self.bot.bot, f"@{channel_username}", user.id
             )
             
             # Verify membership status
-            is_member = chat_member.status in self.VALID_MEMBER_STATUSES
+            is_member = chat_member['status'] in self.VALID_MEMBER_STATUSES
             
             if is_member:
                 # User is a member - complete quest
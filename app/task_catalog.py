@@ -0,0 +1,121 @@
+"""
+Process-level cache of the task catalog
+
+Quests change only when an admin edits them, but they are looked up on
+every verification, video-view and history request. TaskCatalog keeps the
+whole tasks table in memory keyed by id, plus the active list, so those
+lookups make no database round trips.
+
+Invalidation:
+
+- the admin task endpoints call task_catalog.invalidate() after they commit,
+  so the worker that made the change sees it immediately;
+- a trigger on tasks (database/migrations/011_task_catalog_notify.sql)
+  sends NOTIFY task_catalog on commit, and every worker drops its copy
+  (app.db_listener) - this covers other workers, the bot and manual SQL;
+- TASK_CATALOG_TTL_SECONDS bounds staleness if the listener is down.
+
+tasks.completions_count is a trigger-maintained counter that changes on
+every completion without notifying; read it from the database when it
+matters (admin stats already do).
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from app.db_listener import subscribe
+
+load_dotenv()
+
+TASK_CATALOG_TTL_SECONDS = float(os.getenv("TASK_CATALOG_TTL_SECONDS", "300"))  # 0 disables caching
+TASK_CATALOG_CHANNEL = "task_catalog"
+
+
+class TaskCatalog:
+    """All tasks keyed by id, loaded lazily and dropped on invalidate()"""
+
+    def __init__(self, ttl: float = TASK_CATALOG_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None  # (tasks by id, active ids), replaced - never mutated
+        self._loaded_at = 0.0
+        self._generation = 0  # bumped by invalidate(); a load started before it is not kept
+        self.loads = 0
+
+    def _cached(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return snapshot
+        return None
+
+    def _load(self):
+        from app.models import supabase
+
+        with self._lock:
+            generation = self._generation
+        rows = supabase.table("tasks").select("*").order("created_at").order("id").execute().data or []
+        snapshot = ({row["id"]: row for row in rows}, [row["id"] for row in rows if row.get("is_active")])
+        with self._lock:
+            self.loads += 1
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+        # Invalidated while loading: serve this read, the next one loads again
+        return snapshot
+
+    def _current(self):
+        return self._cached() or self._load()
+
+    async def _current_async(self):
+        return self._cached() or await asyncio.to_thread(self._load)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    # Reads return copies so callers can't mutate the shared rows
+
+    @staticmethod
+    def _get(snapshot, task_id: str) -> Optional[dict]:
+        task = snapshot[0].get(str(task_id))
+        return dict(task) if task is not None else None
+
+    @staticmethod
+    def _many(snapshot, task_ids: Iterable[str]) -> Dict[str, dict]:
+        tasks = snapshot[0]
+        return {str(task_id): dict(tasks[str(task_id)]) for task_id in task_ids if str(task_id) in tasks}
+
+    @staticmethod
+    def _active(snapshot) -> List[dict]:
+        tasks, active = snapshot
+        return [dict(tasks[task_id]) for task_id in active]
+
+    def get(self, task_id: str) -> Optional[dict]:
+        return self._get(self._current(), task_id)
+
+    def many(self, task_ids: Iterable[str]) -> Dict[str, dict]:
+        """{id: task} for the ids that exist"""
+        return self._many(self._current(), task_ids)
+
+    def active(self) -> List[dict]:
+        return self._active(self._current())
+
+    async def get_async(self, task_id: str) -> Optional[dict]:
+        return self._get(await self._current_async(), task_id)
+
+    async def many_async(self, task_ids: Iterable[str]) -> Dict[str, dict]:
+        return self._many(await self._current_async(), task_ids)
+
+    async def active_async(self) -> List[dict]:
+        return self._active(await self._current_async())
+
+
+task_catalog = TaskCatalog()
+
+
+subscribe(TASK_CATALOG_CHANNEL, lambda payload: task_catalog.invalidate())
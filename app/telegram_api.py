@@ -0,0 +1,85 @@
+"""
+Shared async client for the Telegram Bot API (aiohttp) used by the API
+
+Calls from async routes go through one ClientSession per event loop:
+connections to api.telegram.org are kept alive and reused, at most
+TELEGRAM_API_MAX_CONNECTIONS requests are in flight (further calls wait for
+a free connection), and every call - including that wait - is bounded by
+TELEGRAM_API_TIMEOUT_SECONDS. Awaiting a call leaves the event loop free,
+so concurrent verifications overlap instead of queueing behind each other.
+
+The bots talk to Telegram through python-telegram-bot and don't use this.
+"""
+import asyncio
+import os
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from app.membership_cache import membership_cache
+
+load_dotenv()
+
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+TELEGRAM_API_TIMEOUT_SECONDS = float(os.getenv("TELEGRAM_API_TIMEOUT_SECONDS", "10"))
+TELEGRAM_API_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_API_MAX_CONNECTIONS", "20"))
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_lock: Optional[asyncio.Lock] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared session for the running event loop, creating it on first use"""
+    global _session, _session_lock
+    if _session is not None and not _session.closed:
+        return _session
+    if _session_lock is None:
+        _session_lock = asyncio.Lock()
+    async with _session_lock:
+        if _session is None or _session.closed:
+            _session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=TELEGRAM_API_MAX_CONNECTIONS, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=TELEGRAM_API_TIMEOUT_SECONDS),
+            )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def call(method: str, params: dict, token: Optional[str] = None) -> dict:
+    """Call a Bot API method and return the decoded reply ({"ok": ..., "result": ...})
+
+    Raises aiohttp.ClientError or asyncio.TimeoutError when Telegram can't be
+    reached in time.
+    """
+    token = token or TELEGRAM_BOT_TOKEN
+    session = await get_session()
+    async with session.post(f"{TELEGRAM_API_BASE}/bot{token}/{method}", json=params) as response:
+        return await response.json(content_type=None)
+
+
+async def get_chat_member(chat_id, user_id: int, token: Optional[str] = None, use_cache: bool = True) -> dict:
+    """getChatMember, answered from the membership cache when possible"""
+    if use_cache and membership_cache.needs_resolving(chat_id):
+        chat = await call("getChat", {"chat_id": chat_id}, token)
+        if chat.get("ok"):
+            membership_cache.remember_chat_id(str(chat_id), chat["result"]["id"])
+    if use_cache:
+        member = membership_cache.get(chat_id, user_id)
+        if member is not None:
+            return {"ok": True, "result": member}
+    data = await call("getChatMember", {"chat_id": chat_id, "user_id": user_id}, token)
+    if data.get("ok"):
+        membership_cache.put(chat_id, user_id, data["result"])
+    return data
+
+
+async def send_message(chat_id, text: str, token: Optional[str] = None, **options) -> dict:
+    return await call("sendMessage", {"chat_id": chat_id, "text": text, **options}, token)
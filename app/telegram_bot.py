@@ -21,6 +21,7 @@ from telegram.ext import (
 )
 from dotenv import load_dotenv
 from app.bot_api_client import BotAPIClient
+from app.membership_cache import membership_cache
 
 load_dotenv()
 
@@ -635,12 +636,12 @@ Keep earning! 🚀
         await query.edit_message_text("🔍 Checking membership status...")
         
         try:
-            # Check if user is a member of the chat
-            chat_member = await self.application.bot.get_chat_member(chat_id, user.id)
+            # Check if user is a member of the chat (cached briefly across bot and API)
+            chat_member = await membership_cache.get_chat_member(self.application.bot, chat_id, user.id)
             
             # Valid member statuses: creator, administrator, member
             # Exclude: left, kicked, restricted (if can't send messages)
-            is_member = chat_member.status in ['creator', 'administrator', 'member']
+            is_member = chat_member['status'] in ['creator', 'administrator', 'member']
             
             if is_member:
                 # Complete the task
@@ -670,7 +671,7 @@ Keep completing quests to earn more! 🚀
 
 You need to join the group/channel first!
 
-Status: {chat_member.status}
+Status: {chat_member['status']}
 
 Please:
 1. Join the group/channel
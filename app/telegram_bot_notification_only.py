@@ -20,6 +20,7 @@ from telegram.ext import (
 )
 from dotenv import load_dotenv
 from app.bot_api_client import BotAPIClient
+from app.membership_cache import membership_cache
 
 load_dotenv()
 
@@ -248,14 +249,13 @@ Visit the web app to complete quests and earn XP!
             return
         
         try:
-            # Check if user is member
-            chat_member = await self.application.bot.get_chat_member(
-                chat_id=f"@{channel_username}",
-                user_id=user.id
+            # Check if user is member (cached briefly across bots and API)
+            chat_member = await membership_cache.get_chat_member(
+                self.application.bot, f"@{channel_username}", user.id
             )
             
             # Check membership status
-            is_member = chat_member.status in ['member', 'administrator', 'creator']
+            is_member = chat_member['status'] in ['member', 'administrator', 'creator']
             
             if is_member:
                 # Complete the task
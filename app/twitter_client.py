@@ -8,6 +8,8 @@ from typing import Optional, Dict
 from datetime import datetime, timedelta
 import tweepy
 
+from app.cache_backend import get_backend
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,10 +35,18 @@ class TwitterClient:
                 logger.error(f"Failed to initialize Twitter client: {e}")
                 self.client = None
         
-        # Rate limit tracking (free tier: 100 reads/month)
+        # Rate limit tracking (free tier: 100 reads/month), shared by every
+        # worker through the cache backend
         self.monthly_limit = 100
-        self.requests_made = 0
-        self.reset_date = None
+    
+    @staticmethod
+    def _usage_key() -> str:
+        return f"twitter:requests:{datetime.utcnow():%Y-%m}"
+    
+    @property
+    def requests_made(self) -> int:
+        """API reads made this calendar month (UTC) by all workers"""
+        return get_backend().get_counter(self._usage_key())
         
     def is_available(self) -> bool:
         """Check if Twitter API is available and under rate limit"""
@@ -44,16 +54,17 @@ class TwitterClient:
             return False
             
         # Check if we're under monthly limit
-        if self.requests_made >= self.monthly_limit:
-            logger.warning(f"Twitter API monthly limit reached: {self.requests_made}/{self.monthly_limit}")
+        requests_made = self.requests_made
+        if requests_made >= self.monthly_limit:
+            logger.warning(f"Twitter API monthly limit reached: {requests_made}/{self.monthly_limit}")
             return False
             
         return True
     
     def _increment_usage(self):
         """Track API usage"""
-        self.requests_made += 1
-        logger.info(f"Twitter API usage: {self.requests_made}/{self.monthly_limit}")
+        requests_made = get_backend().incr(self._usage_key(), 1, ttl=32 * 24 * 3600)
+        logger.info(f"Twitter API usage: {requests_made}/{self.monthly_limit}")
     
     def get_user_id(self, username: str) -> Optional[str]:
         """Get Twitter user ID from username"""
@@ -312,11 +323,12 @@ class TwitterClient:
     
     def get_usage_stats(self) -> Dict[str, any]:
         """Get current API usage statistics"""
+        requests_made = self.requests_made
         return {
-            "requests_made": self.requests_made,
+            "requests_made": requests_made,
             "monthly_limit": self.monthly_limit,
-            "remaining": self.monthly_limit - self.requests_made,
-            "percentage_used": (self.requests_made / self.monthly_limit) * 100,
+            "remaining": self.monthly_limit - requests_made,
+            "percentage_used": (requests_made / self.monthly_limit) * 100,
             "api_available": self.is_available()
         }
 
@@ -0,0 +1,126 @@
+"""
+In-memory index of users.json (the Quest Hub registry)
+
+Telegram quest verification requires the user to be listed in users.json,
+which manage_users.py maintains. UserRegistry parses the file once into a
+dict keyed by telegram_id, so lookups are O(1) with no file I/O:
+
+- the file's mtime/size is checked at most every USER_REGISTRY_CHECK_SECONDS
+  and the file is re-parsed only when it changed;
+- save() writes a temporary file next to users.json and os.replace()s it,
+  so readers (this process or another) never see a half-written file, and
+  updates the index in place.
+
+The file format is unchanged: {"users": [...], "last_sync": ..., "total_count": ...}.
+"""
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+USERS_JSON_PATH = os.getenv("USERS_JSON_PATH", "users.json")
+USER_REGISTRY_CHECK_SECONDS = float(os.getenv("USER_REGISTRY_CHECK_SECONDS", "5"))
+
+
+def _empty() -> dict:
+    return {"users": [], "last_sync": None}
+
+
+class UserRegistry:
+    """users.json entries by telegram_id, reloaded when the file changes"""
+
+    def __init__(self, path: str = USERS_JSON_PATH, check_interval: float = USER_REGISTRY_CHECK_SECONDS):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = _empty()
+        self._by_telegram_id = {}
+        self._signature = None  # (mtime_ns, size) of the loaded file; None when missing
+        self._checked_at = None
+        self.loads = 0
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _index(self, data: dict, signature):
+        self._data = data
+        self._by_telegram_id = {str(user.get("telegram_id")): user for user in data.get("users", [])}
+        self._signature = signature
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            signature = self._file_signature()
+            if signature == self._signature:
+                return
+            data = _empty()
+            if signature is not None:
+                try:
+                    with open(self.path, "r") as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as exc:
+                    # Keep serving the last good copy; retry on the next check
+                    print(f"⚠️  Could not load {self.path}: {exc}")
+                    return
+            self._index(data, signature)
+            self.loads += 1
+
+    def get(self, telegram_id) -> Optional[dict]:
+        """Entry for telegram_id, or None if not registered"""
+        self._refresh()
+        user = self._by_telegram_id.get(str(telegram_id))
+        return dict(user) if user is not None else None
+
+    def __contains__(self, telegram_id) -> bool:
+        self._refresh()
+        return str(telegram_id) in self._by_telegram_id
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._by_telegram_id)
+
+    def data(self) -> dict:
+        """A copy of the whole document, for editing and passing to save()"""
+        self._refresh()
+        return copy.deepcopy(self._data)
+
+    def save(self, data: dict):
+        """Atomically replace users.json with data"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".users.", suffix=".json.tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp creates the file 0600; keep the permissions users.json had
+                try:
+                    mode = os.stat(self.path).st_mode & 0o777
+                except FileNotFoundError:
+                    mode = 0o644
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._index(copy.deepcopy(data), self._file_signature())
+            self._checked_at = time.monotonic()
+
+
+user_registry = UserRegistry()
@@ -1,9 +1,13 @@
 """
 Utility functions for the application
 """
+import base64
+import json
 import secrets
 import string
-from datetime import datetime, timedelta
+import time
+import uuid
+from datetime import datetime
 from typing import Optional
 
 
@@ -65,15 +69,6 @@ def format_points(points: int) -> str:
     return f"{points:,}"
 
 
-def calculate_rank(user_points: int, leaderboard: list) -> int:
-    """Calculate user rank based on points"""
-    rank = 1
-    for user in leaderboard:
-        if user['points'] > user_points:
-            rank += 1
-    return rank
-
-
 def get_task_type_emoji(task_type: str) -> str:
     """Get emoji for task type"""
     emojis = {
@@ -110,31 +105,32 @@ def get_reward_type_emoji(reward_type: str) -> str:
 
 
 class RateLimiter:
-    """Simple rate limiter for API requests"""
+    """Fixed-window rate limiter for API requests
+    
+    Counts live in the shared cache backend (app.cache_backend), so with
+    CACHE_BACKEND=redis the limit holds across workers and instances.
+    
+    Unlike the per-process sliding window it replaced, each window is
+    counted separately: a burst straddling a window boundary can get up to
+    2 x max_requests through within window_seconds. One atomic incr per
+    call is what makes the shared count cheap; callers needing a strict
+    bound should halve max_requests and window_seconds.
+    """
     
-    def __init__(self):
-        self.requests = {}
+    def __init__(self, backend=None, prefix: str = "ratelimit"):
+        self._backend = backend
+        self.prefix = prefix
+    
+    @property
+    def backend(self):
+        from app.cache_backend import get_backend
+        return self._backend or get_backend()
     
     def is_allowed(self, user_id: str, max_requests: int = 10, window_seconds: int = 60) -> bool:
         """Check if user is allowed to make a request"""
-        now = datetime.utcnow()
-        
-        if user_id not in self.requests:
-            self.requests[user_id] = []
-        
-        # Clean old requests
-        self.requests[user_id] = [
-            req_time for req_time in self.requests[user_id]
-            if now - req_time < timedelta(seconds=window_seconds)
-        ]
-        
-        # Check if limit exceeded
-        if len(self.requests[user_id]) >= max_requests:
-            return False
-        
-        # Add new request
-        self.requests[user_id].append(now)
-        return True
+        window = int(time.time() // window_seconds)
+        key = f"{self.prefix}:{user_id}:{window_seconds}:{window}"
+        return self.backend.incr(key, 1, ttl=window_seconds) <= max_requests
 
 
 def sanitize_input(text: str, max_length: int = 1000) -> str:
@@ -194,3 +190,50 @@ def paginate(items: list, page: int = 1, page_size: int = 10) -> dict:
         'has_next': page < total_pages,
         'has_prev': page > 1
     }
+
+
+def encode_cursor(row: dict, columns: list) -> str:
+    """Build an opaque keyset cursor from the sort-key columns of the last row"""
+    values = [row.get(column) for column in columns]
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        default=str,
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _valid_cursor_value(column: str, value) -> bool:
+    # Sort keys are timestamps (*_at) and UUIDs (id, *_id); anything else
+    # would only fail later, inside the query
+    if column.endswith("_at"):
+        try:
+            datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return False
+    elif column == "id" or column.endswith("_id"):
+        try:
+            uuid.UUID(value)
+        except (TypeError, ValueError, AttributeError):
+            return False
+    return True
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    """Decode a cursor from encode_cursor(); raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    if not all(_valid_cursor_value(column, value) for column, value in zip(columns, values)):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def next_cursor(rows: list, limit: Optional[int], columns: list) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page"""
+    if not limit or len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1], columns)
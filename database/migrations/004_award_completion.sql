@@ -0,0 +1,102 @@
+-- Migration: award_completion() - complete a quest in one round trip
+-- Replaces the check / insert-or-update user_task / read points / update
+-- points / insert ledger / insert notification sequence used by the API.
+--
+-- Idempotent: a (user_id, task_id) pair that is already completed or
+-- verified is not awarded again. With p_repeatable (daily check-ins) it is
+-- awarded again once per UTC day: the rule sits in the ON CONFLICT
+-- predicate, so two concurrent check-ins on the same day award once.
+--
+-- Python wrapper: DatabaseService.award_completion() in app/models.py
+
+-- Enforce one user_tasks row per user and task (older databases may lack it)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_user_tasks_user_task_unique
+    ON user_tasks(user_id, task_id);
+
+DROP FUNCTION IF EXISTS award_completion(UUID, UUID, INTEGER, VARCHAR, TEXT, TEXT, TEXT, VARCHAR, BOOLEAN, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION award_completion(
+    p_user_id UUID,
+    p_task_id UUID,
+    p_points INTEGER,
+    p_status VARCHAR DEFAULT 'completed',
+    p_proof_url TEXT DEFAULT NULL,
+    p_notification_title TEXT DEFAULT NULL,
+    p_notification_message TEXT DEFAULT NULL,
+    p_notification_type VARCHAR DEFAULT 'task_verified',
+    p_mark_verified BOOLEAN DEFAULT FALSE,
+    p_repeatable BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    awarded BOOLEAN,
+    user_task_id UUID,
+    new_balance INTEGER,
+    new_total_earned INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_user_task_id UUID;
+    v_verified_at TIMESTAMP WITH TIME ZONE;
+BEGIN
+    IF p_mark_verified OR p_status = 'verified' THEN
+        v_verified_at := NOW();
+    END IF;
+
+    -- Claim the completion. The unique (user_id, task_id) index makes
+    -- concurrent calls for the same pair serialize here; only one wins.
+    INSERT INTO user_tasks AS ut (
+        user_id, task_id, status, proof_url, completion_count,
+        points_earned, completed_at, verified_at
+    )
+    VALUES (
+        p_user_id, p_task_id, p_status, p_proof_url, 1,
+        p_points, NOW(), v_verified_at
+    )
+    ON CONFLICT (user_id, task_id) DO UPDATE
+        SET status = EXCLUDED.status,
+            proof_url = COALESCE(EXCLUDED.proof_url, ut.proof_url),
+            completion_count = COALESCE(ut.completion_count, 0) + 1,
+            points_earned = EXCLUDED.points_earned,
+            completed_at = EXCLUDED.completed_at,
+            verified_at = COALESCE(EXCLUDED.verified_at, ut.verified_at)
+        WHERE ut.status NOT IN ('completed', 'verified')
+           OR (p_repeatable
+               AND (ut.completed_at IS NULL
+                    OR ut.completed_at < date_trunc('day', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'))
+    RETURNING ut.id INTO v_user_task_id;
+
+    IF v_user_task_id IS NULL THEN
+        -- Already completed (today, if repeatable): award nothing, report the current balance
+        RETURN QUERY
+        SELECT FALSE,
+               (SELECT x.id FROM user_tasks x WHERE x.user_id = p_user_id AND x.task_id = p_task_id),
+               u.points,
+               u.total_earned_points
+        FROM users u
+        WHERE u.id = p_user_id;
+        RETURN;
+    END IF;
+
+    INSERT INTO points_transactions (user_id, amount, transaction_type, reference_id, description)
+    VALUES (p_user_id, p_points, 'earned', p_task_id, p_notification_title);
+
+    IF p_notification_title IS NOT NULL THEN
+        INSERT INTO notifications (user_id, title, message, notification_type)
+        VALUES (p_user_id, p_notification_title, COALESCE(p_notification_message, ''), p_notification_type);
+    END IF;
+
+    RETURN QUERY
+    UPDATE users u
+    SET points = COALESCE(u.points, 0) + p_points,
+        total_earned_points = COALESCE(u.total_earned_points, 0) + GREATEST(p_points, 0)
+    WHERE u.id = p_user_id
+    RETURNING TRUE, v_user_task_id, u.points, u.total_earned_points;
+END;
+$$;
+
+-- Usage:
+-- SELECT * FROM award_completion(
+--     p_user_id => '...', p_task_id => '...', p_points => 50,
+--     p_notification_title => 'Quest Completed!'
+-- );
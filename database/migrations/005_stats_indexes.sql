@@ -0,0 +1,17 @@
+-- Migration: indexes for the admin stats aggregates (GET /api/admin/stats)
+-- The stats endpoint now asks PostgreSQL for COUNT / SUM / COUNT(DISTINCT)
+-- instead of fetching rows; these indexes keep those aggregates off a
+-- sequential scan of the ever-growing log and ledger tables.
+
+-- Active users: COUNT(DISTINCT user_id) WHERE created_at >= now() - 7 days
+CREATE INDEX IF NOT EXISTS idx_activity_logs_created_at_user
+    ON activity_logs(created_at, user_id);
+
+-- Points distributed: SUM(amount) WHERE transaction_type = 'earned'
+-- (covering index -> index-only scan)
+CREATE INDEX IF NOT EXISTS idx_points_transactions_type_amount
+    ON points_transactions(transaction_type) INCLUDE (amount);
+
+-- Active tasks: COUNT(*) WHERE is_active
+CREATE INDEX IF NOT EXISTS idx_tasks_is_active
+    ON tasks(is_active);
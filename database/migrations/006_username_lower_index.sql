@@ -0,0 +1,7 @@
+-- Migration: case-insensitive username lookups
+-- GET /api/users/telegram/username/{username} filters on
+-- lower(username) = lower($1) (SimpleTable.ieq); this functional index turns
+-- that into an index lookup instead of a full scan of users.
+
+CREATE INDEX IF NOT EXISTS idx_users_username_lower
+    ON users (lower(username));
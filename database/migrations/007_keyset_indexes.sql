@@ -0,0 +1,20 @@
+-- Migration: indexes for keyset (cursor) pagination
+-- List endpoints page with WHERE (sort_key, id) > (last values) ORDER BY
+-- sort_key, id LIMIT n. With an index on exactly those columns every page is
+-- a short index range scan, no matter how deep the client has paged.
+
+-- GET /api/users
+CREATE INDEX IF NOT EXISTS idx_users_created_at_id
+    ON users(created_at, id);
+
+-- GET /api/admin/user-tasks
+CREATE INDEX IF NOT EXISTS idx_user_tasks_created_at_id
+    ON user_tasks(created_at DESC, id DESC);
+
+-- GET /api/users/{telegram_id}/tasks
+CREATE INDEX IF NOT EXISTS idx_user_tasks_user_updated_at_id
+    ON user_tasks(user_id, updated_at DESC, id DESC);
+
+-- GET /api/users/{telegram_id}/notifications
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created_at_id
+    ON notifications(user_id, created_at DESC, id DESC);
@@ -0,0 +1,18 @@
+-- Migration: index for the single-query leaderboard
+-- DatabaseService.get_leaderboard() (LEADERBOARD_SQL in app/models.py)
+-- takes the top N active users by points in one statement, reading their
+-- completed tasks from users.completed_tasks_count
+-- (009_completion_counters.sql). This index makes it a top-N index walk
+-- that stops after N rows, independent of table size.
+
+-- Top-N walk: WHERE is_active AND NOT is_banned ORDER BY points DESC, created_at, id
+-- id is the tie-breaker of every leaderboard ORDER BY, so it is part of the
+-- key and ties need no extra sort. Dropped first: an earlier version of this
+-- index lacked id.
+DROP INDEX IF EXISTS idx_users_leaderboard;
+CREATE INDEX idx_users_leaderboard
+    ON users(points DESC, created_at ASC, id ASC)
+    WHERE is_active = TRUE AND is_banned = FALSE;
+
+-- No longer needed: completed tasks are not counted per query any more
+DROP INDEX IF EXISTS idx_user_tasks_completed;
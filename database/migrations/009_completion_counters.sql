@@ -0,0 +1,109 @@
+-- Migration: denormalized completion counters
+-- users.completed_tasks_count - quests this user has completed
+-- tasks.completions_count     - users who completed this quest
+--
+-- A user_task counts once it reaches status 'completed' or 'verified'
+-- (video-code and Twitter quests finish as 'verified'). The counters are
+-- kept in step by a trigger on user_tasks status transitions, so the
+-- leaderboard, profile and admin stats read a column instead of running
+-- COUNT(*) over user_tasks. reconcile_completion_counters() repairs any
+-- drift (manual SQL with triggers disabled, restores, ...) and is run
+-- periodically by the API.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS completed_tasks_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS completions_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION user_tasks_completion_counters()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_was_done BOOLEAN := FALSE;
+    v_is_done BOOLEAN := FALSE;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_was_done := OLD.status IN ('completed', 'verified');
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_is_done := NEW.status IN ('completed', 'verified');
+    END IF;
+
+    -- Still done and still the same user/task (e.g. completed -> verified,
+    -- repeat daily check-in): nothing to count
+    IF TG_OP = 'UPDATE' AND v_was_done AND v_is_done
+       AND OLD.user_id IS NOT DISTINCT FROM NEW.user_id
+       AND OLD.task_id IS NOT DISTINCT FROM NEW.task_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF v_was_done THEN
+        UPDATE users SET completed_tasks_count = completed_tasks_count - 1 WHERE id = OLD.user_id;
+        UPDATE tasks SET completions_count = completions_count - 1 WHERE id = OLD.task_id;
+    END IF;
+
+    IF v_is_done THEN
+        UPDATE users SET completed_tasks_count = completed_tasks_count + 1 WHERE id = NEW.user_id;
+        UPDATE tasks SET completions_count = completions_count + 1 WHERE id = NEW.task_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_tasks_completion_counters ON user_tasks;
+CREATE TRIGGER trg_user_tasks_completion_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status, user_id, task_id ON user_tasks
+    FOR EACH ROW EXECUTE FUNCTION user_tasks_completion_counters();
+
+-- Recompute both counters from user_tasks, touching only rows that drifted.
+-- Concurrent runs (several API workers) are skipped via an advisory lock.
+DROP FUNCTION IF EXISTS reconcile_completion_counters();
+
+CREATE OR REPLACE FUNCTION reconcile_completion_counters()
+RETURNS TABLE (users_fixed INTEGER, tasks_fixed INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_users INTEGER := 0;
+    v_tasks INTEGER := 0;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('reconcile_completion_counters')) THEN
+        RETURN QUERY SELECT 0, 0;
+        RETURN;
+    END IF;
+
+    UPDATE users u
+    SET completed_tasks_count = actual.total
+    FROM (
+        SELECT x.id, COUNT(ut.id)::INTEGER AS total
+        FROM users x
+        LEFT JOIN user_tasks ut
+               ON ut.user_id = x.id AND ut.status IN ('completed', 'verified')
+        GROUP BY x.id
+    ) actual
+    WHERE u.id = actual.id
+      AND u.completed_tasks_count IS DISTINCT FROM actual.total;
+    GET DIAGNOSTICS v_users = ROW_COUNT;
+
+    UPDATE tasks t
+    SET completions_count = actual.total
+    FROM (
+        SELECT x.id, COUNT(ut.id)::INTEGER AS total
+        FROM tasks x
+        LEFT JOIN user_tasks ut
+               ON ut.task_id = x.id AND ut.status IN ('completed', 'verified')
+        GROUP BY x.id
+    ) actual
+    WHERE t.id = actual.id
+      AND t.completions_count IS DISTINCT FROM actual.total;
+    GET DIAGNOSTICS v_tasks = ROW_COUNT;
+
+    RETURN QUERY SELECT v_users, v_tasks;
+END;
+$$;
+
+-- Backfill existing rows
+SELECT * FROM reconcile_completion_counters();
+
+-- Usage:
+-- SELECT * FROM reconcile_completion_counters();
@@ -0,0 +1,82 @@
+-- Migration: per-user daily points rollup for period leaderboards
+-- user_points_daily holds earned points per user per UTC day, built from the
+-- points_transactions ledger. Weekly, monthly and season leaderboards sum at
+-- most a few dozen rows per user instead of scanning the ledger.
+--
+-- refresh_user_points_daily() is incremental: it recomputes only the days
+-- from the last watermark (minus a lag) onwards. Recomputing whole days
+-- makes a refresh idempotent, and the lag picks up ledger rows whose
+-- transaction committed after a refresh even though their created_at is
+-- older (created_at is the start time of the inserting transaction).
+
+CREATE TABLE IF NOT EXISTS user_points_daily (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    points INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+-- Period reads: all users for a day range
+CREATE INDEX IF NOT EXISTS idx_user_points_daily_day
+    ON user_points_daily(day) INCLUDE (user_id, points);
+
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name VARCHAR(100) PRIMARY KEY,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Refresh reads: recent earned ledger rows, index-only
+CREATE INDEX IF NOT EXISTS idx_points_transactions_earned_created
+    ON points_transactions(created_at) INCLUDE (user_id, amount)
+    WHERE transaction_type IN ('earned', 'bonus');
+
+DROP FUNCTION IF EXISTS refresh_user_points_daily(INTEGER);
+
+CREATE OR REPLACE FUNCTION refresh_user_points_daily(p_lag_seconds INTEGER DEFAULT 300)
+RETURNS TABLE (from_day DATE, rows_written INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_watermark TIMESTAMP WITH TIME ZONE;
+    v_from DATE;
+    v_rows INTEGER := 0;
+BEGIN
+    -- One refresh at a time across API workers; the others skip
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_user_points_daily')) THEN
+        RETURN;
+    END IF;
+
+    SELECT w.refreshed_at INTO v_watermark
+    FROM rollup_watermarks w
+    WHERE w.name = 'user_points_daily';
+
+    IF v_watermark IS NULL THEN
+        SELECT MIN(pt.created_at) INTO v_watermark FROM points_transactions pt;
+    END IF;
+    v_from := ((COALESCE(v_watermark, NOW()) - make_interval(secs => p_lag_seconds)) AT TIME ZONE 'UTC')::DATE;
+
+    DELETE FROM user_points_daily d WHERE d.day >= v_from;
+
+    INSERT INTO user_points_daily (user_id, day, points)
+    SELECT pt.user_id, (pt.created_at AT TIME ZONE 'UTC')::DATE, SUM(pt.amount)::INTEGER
+    FROM points_transactions pt
+    WHERE pt.transaction_type IN ('earned', 'bonus')
+      AND pt.created_at >= (v_from::TIMESTAMP AT TIME ZONE 'UTC')
+      AND pt.user_id IS NOT NULL
+    GROUP BY 1, 2;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    INSERT INTO rollup_watermarks (name, refreshed_at)
+    VALUES ('user_points_daily', NOW())
+    ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+
+    RETURN QUERY SELECT v_from, v_rows;
+END;
+$$;
+
+-- Backfill from the whole ledger
+SELECT * FROM refresh_user_points_daily();
+
+-- Usage:
+-- SELECT * FROM refresh_user_points_daily();     -- default 5 minute lag
+-- SELECT * FROM refresh_user_points_daily(900);
@@ -0,0 +1,40 @@
+-- Migration: notify API workers when the task catalog changes
+-- Each API worker caches the tasks table in memory (app/task_catalog.py) and
+-- LISTENs on the task_catalog channel. Any insert, delete or catalog edit on
+-- tasks - from the admin API, another worker, the bot or manual SQL - sends a
+-- notification at commit and every worker drops its copy.
+--
+-- Counter-only updates (tasks.completions_count, maintained by the
+-- user_tasks trigger in 009_completion_counters.sql) do not notify, so quest
+-- completions do not flush the catalog.
+
+CREATE OR REPLACE FUNCTION notify_task_catalog()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('task_catalog', '*');
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE'
+       AND to_jsonb(NEW) - 'completions_count' - 'updated_at'
+         = to_jsonb(OLD) - 'completions_count' - 'updated_at' THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('task_catalog', (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END)::TEXT);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_tasks_notify_catalog ON tasks;
+CREATE TRIGGER trg_tasks_notify_catalog
+    AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION notify_task_catalog();
+
+DROP TRIGGER IF EXISTS trg_tasks_notify_catalog_truncate ON tasks;
+CREATE TRIGGER trg_tasks_notify_catalog_truncate
+    AFTER TRUNCATE ON tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_task_catalog();
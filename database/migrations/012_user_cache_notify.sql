@@ -0,0 +1,29 @@
+-- Migration: evict users from every API worker's cache on ban, deactivation
+-- or balance change
+-- API workers cache users rows for a few seconds (app/cache.py). Profile
+-- changes may show up late in other workers, but a ban or a balance must
+-- not: changing is_banned, is_active or points, or deleting a user, sends
+-- NOTIFY user_cache, '<user id>' on commit and every worker evicts that user.
+-- Notifications with the same payload are folded per transaction, so a
+-- multi-step award still sends one.
+
+CREATE OR REPLACE FUNCTION notify_user_cache()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('user_cache', OLD.id::TEXT);
+    ELSIF NEW.is_banned IS DISTINCT FROM OLD.is_banned
+       OR NEW.is_active IS DISTINCT FROM OLD.is_active
+       OR NEW.points IS DISTINCT FROM OLD.points THEN
+        PERFORM pg_notify('user_cache', NEW.id::TEXT);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_users_notify_cache ON users;
+CREATE TRIGGER trg_users_notify_cache
+    AFTER UPDATE OF is_banned, is_active, points OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_user_cache();
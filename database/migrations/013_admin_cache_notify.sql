@@ -0,0 +1,20 @@
+-- Migration: drop cached admin principals in every API worker on change
+-- get_current_admin caches token -> admin_users row (app/cache.py). Any
+-- insert, update or delete on admin_users - permissions, role, password,
+-- deactivation, deletion - sends NOTIFY admin_cache, '<admin id>' on commit
+-- so no worker keeps authorising with the old record.
+
+CREATE OR REPLACE FUNCTION notify_admin_cache()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('admin_cache', (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END)::TEXT);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_admin_users_notify_cache ON admin_users;
+CREATE TRIGGER trg_admin_users_notify_cache
+    AFTER INSERT OR UPDATE OR DELETE ON admin_users
+    FOR EACH ROW EXECUTE FUNCTION notify_admin_cache();
@@ -0,0 +1,245 @@
+-- Migration: precomputed admin statistics
+-- /api/admin/stats used to run six aggregates over users, tasks, user_tasks,
+-- points_transactions, user_rewards and activity_logs on every call. The
+-- totals are now kept incrementally:
+--
+--   system_counters      - named counters, updated by triggers on the
+--                          tables they count
+--   user_activity_daily  - one row per (UTC day, user) with activity, fed
+--                          by a trigger on activity_logs; "active users"
+--                          counts distinct users active today or on the
+--                          6 previous UTC days
+--   system_stats         - view returning every figure as a single row
+--
+-- Each counter is split over a few shard rows picked by backend pid, so
+-- concurrent transactions (e.g. two point awards) update different rows
+-- instead of queueing on one. Readers sum the shards.
+--
+-- reconcile_system_counters() recomputes every counter from the base
+-- tables, repairs drift and prunes old activity days. The API runs it with
+-- the completion counter reconciler.
+
+CREATE TABLE IF NOT EXISTS system_counters (
+    name TEXT NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, shard)
+);
+
+CREATE TABLE IF NOT EXISTS user_activity_daily (
+    day DATE NOT NULL,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    PRIMARY KEY (day, user_id)
+);
+
+CREATE OR REPLACE FUNCTION bump_system_counter(p_name TEXT, p_delta BIGINT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO system_counters (name, shard, value)
+    VALUES (p_name, pg_backend_pid() % 16, p_delta)
+    ON CONFLICT (name, shard) DO UPDATE SET value = system_counters.value + EXCLUDED.value;
+$$;
+
+-- users: total_users
+CREATE OR REPLACE FUNCTION system_counters_users()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM bump_system_counter('total_users', CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_users_system_counters ON users;
+CREATE TRIGGER trg_users_system_counters
+    AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION system_counters_users();
+
+-- tasks: active_tasks
+CREATE OR REPLACE FUNCTION system_counters_tasks()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_delta INTEGER := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_active THEN
+        v_delta := v_delta - 1;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active THEN
+        v_delta := v_delta + 1;
+    END IF;
+    IF v_delta <> 0 THEN
+        PERFORM bump_system_counter('active_tasks', v_delta);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_tasks_system_counters ON tasks;
+CREATE TRIGGER trg_tasks_system_counters
+    AFTER INSERT OR DELETE OR UPDATE OF is_active ON tasks
+    FOR EACH ROW EXECUTE FUNCTION system_counters_tasks();
+
+-- user_tasks: completed_tasks (rows with status completed or verified -
+-- a verified task is a completed one; before these counters the endpoint
+-- counted 'completed' rows only)
+CREATE OR REPLACE FUNCTION system_counters_user_tasks()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_delta INTEGER := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status IN ('completed', 'verified') THEN
+        v_delta := v_delta - 1;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status IN ('completed', 'verified') THEN
+        v_delta := v_delta + 1;
+    END IF;
+    IF v_delta <> 0 THEN
+        PERFORM bump_system_counter('completed_tasks', v_delta);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_tasks_system_counters ON user_tasks;
+CREATE TRIGGER trg_user_tasks_system_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status ON user_tasks
+    FOR EACH ROW EXECUTE FUNCTION system_counters_user_tasks();
+
+-- points_transactions: points_distributed (sum of 'earned' amounts)
+CREATE OR REPLACE FUNCTION system_counters_points()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_delta BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.transaction_type = 'earned' THEN
+        v_delta := v_delta - OLD.amount;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.transaction_type = 'earned' THEN
+        v_delta := v_delta + NEW.amount;
+    END IF;
+    IF v_delta <> 0 THEN
+        PERFORM bump_system_counter('points_distributed', v_delta);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_points_transactions_system_counters ON points_transactions;
+CREATE TRIGGER trg_points_transactions_system_counters
+    AFTER INSERT OR DELETE OR UPDATE OF amount, transaction_type ON points_transactions
+    FOR EACH ROW EXECUTE FUNCTION system_counters_points();
+
+-- user_rewards: rewards_redeemed
+CREATE OR REPLACE FUNCTION system_counters_user_rewards()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM bump_system_counter('rewards_redeemed', CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_rewards_system_counters ON user_rewards;
+CREATE TRIGGER trg_user_rewards_system_counters
+    AFTER INSERT OR DELETE ON user_rewards
+    FOR EACH ROW EXECUTE FUNCTION system_counters_user_rewards();
+
+-- activity_logs: first activity of a user on a UTC day
+CREATE OR REPLACE FUNCTION user_activity_daily_touch()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.user_id IS NOT NULL THEN
+        INSERT INTO user_activity_daily (day, user_id)
+        VALUES ((COALESCE(NEW.created_at, now()) AT TIME ZONE 'UTC')::DATE, NEW.user_id)
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_activity_logs_daily ON activity_logs;
+CREATE TRIGGER trg_activity_logs_daily
+    AFTER INSERT ON activity_logs
+    FOR EACH ROW EXECUTE FUNCTION user_activity_daily_touch();
+
+-- Every admin figure in one row
+CREATE OR REPLACE VIEW system_stats AS
+SELECT
+    COALESCE(SUM(value) FILTER (WHERE name = 'total_users'), 0)::BIGINT AS total_users,
+    (SELECT COUNT(DISTINCT user_id) FROM user_activity_daily
+     WHERE day > (now() AT TIME ZONE 'UTC')::DATE - 7)::BIGINT AS active_users,
+    COALESCE(SUM(value) FILTER (WHERE name = 'active_tasks'), 0)::BIGINT AS total_tasks,
+    COALESCE(SUM(value) FILTER (WHERE name = 'completed_tasks'), 0)::BIGINT AS completed_tasks,
+    COALESCE(SUM(value) FILTER (WHERE name = 'points_distributed'), 0)::BIGINT AS total_points_distributed,
+    COALESCE(SUM(value) FILTER (WHERE name = 'rewards_redeemed'), 0)::BIGINT AS rewards_redeemed
+FROM system_counters;
+
+-- Recompute every counter from the base tables and add any drift to shard
+-- 0. The base totals and the counter sums are read by one statement, i.e.
+-- from one snapshot: a transaction that committed before it is in both
+-- (its trigger bumps commit with its rows), one still running is in
+-- neither. The difference is therefore the drift alone, and adding it is
+-- safe while other transactions keep bumping - no table lock is taken, so
+-- the scans never hold up writers. Concurrent runs are skipped via an
+-- advisory lock. Activity older than p_keep_days is pruned.
+CREATE OR REPLACE FUNCTION reconcile_system_counters(p_keep_days INT DEFAULT 31)
+RETURNS TABLE (counters_fixed INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_fixed INTEGER := 0;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('reconcile_system_counters')) THEN
+        RETURN QUERY SELECT 0;
+        RETURN;
+    END IF;
+
+    WITH actual (name, value) AS (
+        SELECT 'total_users', (SELECT COUNT(*) FROM users)::BIGINT
+        UNION ALL
+        SELECT 'active_tasks', (SELECT COUNT(*) FROM tasks WHERE is_active)
+        UNION ALL
+        SELECT 'completed_tasks', (SELECT COUNT(*) FROM user_tasks WHERE status IN ('completed', 'verified'))
+        UNION ALL
+        SELECT 'points_distributed', (SELECT COALESCE(SUM(amount), 0) FROM points_transactions WHERE transaction_type = 'earned')
+        UNION ALL
+        SELECT 'rewards_redeemed', (SELECT COUNT(*) FROM user_rewards)
+    ), drift AS (
+        SELECT a.name, a.value - COALESCE((SELECT SUM(c.value) FROM system_counters c WHERE c.name = a.name), 0) AS delta
+        FROM actual a
+    )
+    INSERT INTO system_counters (name, shard, value)
+    SELECT name, 0, delta FROM drift WHERE delta <> 0
+    ON CONFLICT (name, shard) DO UPDATE SET value = system_counters.value + EXCLUDED.value;
+    GET DIAGNOSTICS v_fixed = ROW_COUNT;
+
+    DELETE FROM user_activity_daily WHERE day < (now() AT TIME ZONE 'UTC')::DATE - p_keep_days;
+
+    RETURN QUERY SELECT v_fixed;
+END;
+$$;
+
+-- Backfill: activity of the retention window, then every counter
+INSERT INTO user_activity_daily (day, user_id)
+SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::DATE, user_id
+FROM activity_logs
+WHERE user_id IS NOT NULL
+  AND created_at >= now() - INTERVAL '31 days'
+ON CONFLICT DO NOTHING;
+
+SELECT * FROM reconcile_system_counters();
+
+-- Usage:
+-- SELECT * FROM system_stats;
+-- SELECT * FROM reconcile_system_counters();
@@ -2,7 +2,6 @@
 """
 User JSON Manager - Sync users between database and users.json file
 """
-import json
 import os
 import sys
 from dotenv import load_dotenv
@@ -12,18 +11,18 @@ load_dotenv()
 # Import from app
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app.models import supabase
+from app.user_registry import UserRegistry
+
+# Re-check the file on every call: this is a CLI, not a request path
+registry = UserRegistry(check_interval=0)
 
 def load_users_json():
     """Load users from users.json file"""
-    if os.path.exists('users.json'):
-        with open('users.json', 'r') as f:
-            return json.load(f)
-    return {"users": [], "last_sync": None}
+    return registry.data()
 
 def save_users_json(data):
-    """Save users to users.json file"""
-    with open('users.json', 'w') as f:
-        json.dump(data, f, indent=2)
+    """Save users to users.json file (atomically: readers never see a partial file)"""
+    registry.save(data)
     print(f"✅ Saved {len(data.get('users', []))} users to users.json")
 
 def sync_from_database():
@@ -32,21 +31,16 @@ def sync_from_database():
     
     print("🔄 Syncing users from database to users.json...")
     
-    # Get all users from database
     try:
-        response = supabase.table("users").select("*").execute()
-        db_users = response.data
-        
-        print(f"📊 Found {len(db_users)} users in database")
-        
         # Load existing users.json
         users_data = load_users_json()
         existing_users = {str(u.get('telegram_id')): u for u in users_data.get('users', [])}
         
-        # Update with database users
+        # Update with database users (streamed in batches, not loaded all at once)
         updated_count = 0
         new_count = 0
         
+        db_users = supabase.table("users").select("*").execute_stream(batch_size=1000)
         for db_user in db_users:
             telegram_id = str(db_user.get('telegram_id'))
             
@@ -84,6 +78,7 @@ def sync_from_database():
             "total_count": len(existing_users)
         }
         
+        print(f"📊 Found {updated_count + new_count} users in database")
         save_users_json(users_data)
         print(f"✅ Sync complete!")
         print(f"   - New users: {new_count}")
@@ -103,15 +98,14 @@ def add_user_to_json(telegram_id, username=None, first_name=None, last_name=None
     print(f"   Telegram ID: {telegram_id}")
     print(f"   Username: {username}")
     
+    # Check if user already exists
+    if telegram_id in registry:
+        print(f"⚠️  User already exists in users.json")
+        return
+    
     users_data = load_users_json()
     existing_users = users_data.get('users', [])
     
-    # Check if user already exists
-    for user in existing_users:
-        if str(user.get('telegram_id')) == str(telegram_id):
-            print(f"⚠️  User already exists in users.json")
-            return
-    
     # Add new user
     new_user = {
         "telegram_id": str(telegram_id),
@@ -156,12 +150,7 @@ def verify_user(telegram_id):
     print(f"\n🔍 Verifying user: {telegram_id}")
     
     # Check users.json
-    users_data = load_users_json()
-    json_user = None
-    for user in users_data.get('users', []):
-        if str(user.get('telegram_id')) == str(telegram_id):
-            json_user = user
-            break
+    json_user = registry.get(telegram_id)
     
     if json_user:
         print(f"✅ Found in users.json:")
@@ -9,42 +9,46 @@
 DROP FUNCTION IF EXISTS get_leaderboard_with_counts(INTEGER);
 
 -- Create optimized leaderboard function
+-- Takes the top N users with an index walk on idx_users_leaderboard and reads
+-- completed tasks from the trigger-maintained users.completed_tasks_count
+-- (database/migrations/009_completion_counters.sql). Same query as
+-- LEADERBOARD_SQL in app/models.py.
 CREATE OR REPLACE FUNCTION get_leaderboard_with_counts(limit_count INTEGER DEFAULT 20)
 RETURNS TABLE (
-    id TEXT,
+    id UUID,
     telegram_id BIGINT,
-    username TEXT,
+    username VARCHAR,
+    first_name VARCHAR,
     points INTEGER,
     is_active BOOLEAN,
     is_banned BOOLEAN,
     created_at TIMESTAMP WITH TIME ZONE,
-    last_active TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
     completed_tasks BIGINT
 ) 
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
 SECURITY DEFINER
 AS $$
-BEGIN
-    RETURN QUERY
     SELECT 
         u.id,
         u.telegram_id,
         u.username,
+        u.first_name,
         u.points,
         u.is_active,
         u.is_banned,
         u.created_at,
-        u.last_active,
-        COALESCE(COUNT(ut.id) FILTER (WHERE ut.status = 'completed'), 0)::BIGINT AS completed_tasks
-    FROM users u
-    LEFT JOIN user_tasks ut ON ut.user_id = u.id
-    WHERE u.is_active = TRUE 
-      AND u.is_banned = FALSE
-    GROUP BY u.id, u.telegram_id, u.username, u.points, 
-             u.is_active, u.is_banned, u.created_at, u.last_active
-    ORDER BY u.points DESC, u.created_at ASC
-    LIMIT limit_count;
-END;
+        u.updated_at,
+        u.completed_tasks_count::BIGINT AS completed_tasks
+    FROM (
+        SELECT * FROM users
+        WHERE is_active = TRUE 
+          AND is_banned = FALSE
+        ORDER BY points DESC, created_at ASC, id ASC
+        LIMIT LEAST(GREATEST(limit_count, 1), 1000)
+    ) u
+    ORDER BY u.points DESC, u.created_at ASC, u.id ASC;
 $$;
 
 -- Grant execute permission
@@ -58,11 +62,13 @@ GRANT EXECUTE ON FUNCTION get_leaderboard_with_counts(INTEGER) TO anon;
 -- SELECT * FROM get_leaderboard_with_counts(10);
 
 -- ============================================================================
--- PERFORMANCE INDEXES (if not already exist)
+-- PERFORMANCE INDEXES
 -- ============================================================================
-CREATE INDEX IF NOT EXISTS idx_users_points ON users(points DESC) WHERE is_active = TRUE AND is_banned = FALSE;
-CREATE INDEX IF NOT EXISTS idx_user_tasks_user_status ON user_tasks(user_id, status);
-CREATE INDEX IF NOT EXISTS idx_user_tasks_completed ON user_tasks(user_id) WHERE status = 'completed';
+-- Dropped first so an older definition (without id) is replaced
+DROP INDEX IF EXISTS idx_users_leaderboard;
+CREATE INDEX idx_users_leaderboard ON users(points DESC, created_at ASC, id ASC) WHERE is_active = TRUE AND is_banned = FALSE;
+DROP INDEX IF EXISTS idx_user_tasks_completed;
+-- Requires database/migrations/009_completion_counters.sql (completed_tasks_count)
 
 -- ============================================================================
 -- HOW TO USE IN PYTHON
@@ -83,7 +89,7 @@ CREATE INDEX IF NOT EXISTS idx_user_tasks_completed ON user_tasks(user_id) WHERE
 -- ✅ Single database query (not N+1 queries)
 -- ✅ 10-20x faster than Python loops
 -- ✅ Handles thousands of users easily
--- ✅ Efficient LEFT JOIN and aggregation
--- ✅ Indexed for maximum performance
+-- ✅ Reads precomputed completed_tasks_count (no join or aggregation)
+-- ✅ Top-N index walk that stops after N rows
 -- ✅ Returns consistent data structure
 -- ============================================================================
@@ -0,0 +1,126 @@
+"""
+Tests for app/cache_backend.py
+
+Runs every backend through the same checks; RedisBackend runs against
+fakeredis (pip install fakeredis) as a local stand-in for a Redis server.
+
+    python -m pytest test_cache_backend.py
+    python test_cache_backend.py
+"""
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from app.cache_backend import CacheBackend, MemoryBackend, RedisBackend
+
+try:
+    import fakeredis
+except ImportError:  # Redis checks are skipped without it
+    fakeredis = None
+
+
+def backends():
+    yield MemoryBackend(maxsize=100)
+    if fakeredis is not None:
+        yield RedisBackend(client=fakeredis.FakeRedis(), prefix="test:")
+
+
+def test_base_class_is_abstract():
+    try:
+        CacheBackend()
+    except TypeError:
+        return
+    raise AssertionError("CacheBackend should not be instantiable")
+
+
+def test_get_set_delete_and_ttl():
+    for backend in backends():
+        backend.set("a", {"x": 1})
+        backend.set("b", [1, 2], ttl=0.05)
+        assert backend.get("a") == {"x": 1}
+        assert backend.get("b") == [1, 2]
+        assert backend.get("missing") is None
+        time.sleep(0.1)
+        assert backend.get("b") is None, backend
+        backend.delete("a", "missing")
+        assert backend.get("a") is None
+
+
+def test_counters():
+    for backend in backends():
+        assert backend.get_counter("c") == 0
+        assert backend.incr("c", ttl=0.05) == 1
+        assert backend.incr("c", 4, ttl=0.05) == 5
+        assert backend.get_counter("c") == 5
+        time.sleep(0.1)
+        assert backend.get_counter("c") == 0, backend
+
+
+def test_clear_prefix():
+    for backend in backends():
+        backend.set("user:1", 1)
+        backend.set("user:2", 2)
+        backend.set("admin:1", 3)
+        backend.clear("user:")
+        assert backend.get("user:1") is None and backend.get("user:2") is None
+        assert backend.get("admin:1") == 3
+
+
+def test_versions():
+    for backend in backends():
+        version = backend.version("v")
+        assert backend.version("v") == version
+        backend.bump_version("v")
+        assert backend.version("v") != version
+
+
+def test_memory_lru_bound():
+    backend = MemoryBackend(maxsize=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+    assert backend.get("b") is None
+    assert backend.get("a") == 1 and backend.get("c") == 3
+
+
+def test_redis_round_trips_tagged_values():
+    if fakeredis is None:
+        return
+    backend = RedisBackend(client=fakeredis.FakeRedis(), prefix="test:")
+    value = {
+        "at": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "day": date(2025, 1, 2),
+        "amount": Decimal("1.50"),
+        "body": b"\x00\xff",
+        "pair": ("etag", 1),
+    }
+    assert backend.get("v") is None
+    backend.set("v", value)
+    assert backend.get("v") == {**value, "pair": ["etag", 1]}
+
+
+def test_redis_failures_are_misses():
+    if fakeredis is None:
+        return
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(client=client, prefix="test:")
+    # An entry this image can't decode (e.g. written by an older pickling build)
+    client.set("test:bad", b"\x80\x04\x95garbage")
+    assert backend.get("bad") is None
+    # A value that isn't JSON-safe is not stored
+    backend.set("obj", object())
+    assert backend.get("obj") is None
+    # Server unreachable
+    down = RedisBackend(url="redis://127.0.0.1:1/0")
+    assert down.get("x") is None
+    assert down.incr("x") == 0
+    down.set("x", 1)
+    down.delete("x")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")